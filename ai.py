@@ -0,0 +1,183 @@
+import math
+import random
+import time
+
+from collision import sweep_circle_aabb
+from simulation import (
+    HIT_NET, HIT_PADDLE, HIT_WALL, MAX_BALL_SPEED, SERVE, SPEED_FACTOR,
+    P1_JUMP, P1_LEFT, P1_RIGHT, P2_JUMP, P2_LEFT, P2_RIGHT,
+)
+
+# reaction_ticks: รอกี่ tick หลังลูกบอลเปลี่ยนทิศก่อนจะคำนวณใหม่
+# error: ระยะผิดพลาด (px) ของจุดที่คาดว่าลูกจะตกเมื่อลูกบอลเร็วเท่า READ_SPEED เร็วกว่านั้นผิดมากขึ้นตามส่วน
+# jump_lead: กระโดดเมื่อลูกบอลจะมาถึงภายในกี่ tick (0 = ไม่กระโดด)
+DIFFICULTIES = {
+    'easy': {'reaction_ticks': 20, 'error': 70, 'jump_lead': 0},
+    'normal': {'reaction_ticks': 8, 'error': 30, 'jump_lead': 10},
+    'hard': {'reaction_ticks': 2, 'error': 8, 'jump_lead': 14},
+}
+
+BUDGET = 0.0005  # เวลา CPU สูงสุดต่อ tick (วินาที) ประมาณ 3% ของเฟรม 60 Hz
+MAX_SEGMENTS = 16  # จำนวนครั้งที่ลูกบอลเด้งได้มากที่สุดในการทำนายหนึ่งครั้ง
+AIM_OFFSET = 20  # ให้ลูกบอลโดนหัวค่อนไปทางตาข่าย จะได้เด้งกลับไปฝั่งตรงข้าม
+DEAD_ZONE = 4
+READ_SPEED = 8.0  # ความเร็วลูกบอล (px/tick) ที่ error เป็นค่าตามตาราง ลูกช้ากว่านี้ไม่ได้อ่านง่ายขึ้น
+
+_INVALIDATING = (HIT_WALL, HIT_PADDLE, HIT_NET, SERVE)
+
+
+def ticks_for_distance(s, speed=None, factor=SPEED_FACTOR, limit=MAX_BALL_SPEED):
+    # ลูกบอลเคลื่อนที่ v * factor^k ใน tick ที่ k ระยะรวมหลัง n tick คือ v * (factor^n - 1) / (factor - 1)
+    # ฟังก์ชันนี้หา n จากระยะ s (หน่วยเป็นจำนวนเท่าของความเร็วปัจจุบัน speed)
+    # เมื่อเร่งจนถึง limit แล้วความเร็วคงที่ ส่วนที่เหลือจึงเป็นเส้นตรง
+    if factor == 1:
+        return s
+    if not speed:  # ไม่รู้ความเร็ว คิดแบบเร่งได้ไม่จำกัด
+        return math.log1p(s * (factor - 1)) / math.log(factor)
+    if speed >= limit:
+        return s
+    ratio = limit / speed
+    ramp = (ratio - 1) / (factor - 1)  # ระยะที่เดินได้ก่อนถึงความเร็วสูงสุด
+    if s <= ramp:
+        return math.log1p(s * (factor - 1)) / math.log(factor)
+    return math.log(ratio) / math.log(factor) + (s - ramp) / ratio
+
+
+def predict_intercept(match, target_y, deadline=None):
+    # หาจุดที่ลูกบอลจะลงมาถึงความสูง target_y โดยคิดการสะท้อนกับเพดาน ผนัง และตาข่าย
+    # คืนค่า (x ของจุดศูนย์กลางลูกบอล, จำนวน tick ที่เหลือ) หรือ None ถ้าทำนายไม่ได้
+    ball = match.ball
+    net = match.net
+    r = ball.size / 2
+    cx = ball.x + r
+    cy = ball.y + r
+    vx = ball.vx
+    vy = ball.vy
+    width = match.width
+    height = match.height
+    target_cy = target_y + r
+    travelled = 0.0
+    if vx == 0 and vy == 0:
+        return None
+
+    for _ in range(MAX_SEGMENTS):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        # ระยะ (เป็นจำนวนเท่าของความเร็ว) ไปถึงแต่ละผิว เลือกผิวที่ถึงก่อน
+        best = math.inf
+        normal = None
+        if vy < 0 and cy > target_cy:
+            s = (target_cy - cy) / vy
+            if s < best:
+                best, normal = s, 'target'
+        if vy > 0:
+            s = (height - r - cy) / vy
+            if s < best:
+                best, normal = s, (0.0, -1.0)
+        if vx < 0:
+            s = (r - cx) / vx
+            if s < best:
+                best, normal = s, (1.0, 0.0)
+        elif vx > 0:
+            s = (width - r - cx) / vx
+            if s < best:
+                best, normal = s, (-1.0, 0.0)
+        if normal is None:
+            return None
+        reach = best if best != math.inf else 0.0
+        contact = sweep_circle_aabb(cx, cy, vx * reach, vy * reach, r, net.x, 0, net.right, net.height)
+        if contact is not None:
+            best = contact[0] * reach
+            normal = (contact[1], contact[2])
+
+        best = max(best, 0.0)
+        cx += vx * best
+        cy += vy * best
+        travelled += best
+        if normal == 'target':
+            return cx, ticks_for_distance(travelled, math.hypot(ball.vx, ball.vy))
+        nx, ny = normal
+        dot = vx * nx + vy * ny
+        vx -= 2 * dot * nx
+        vy -= 2 * dot * ny
+    return None
+
+
+class CpuController:
+    # ควบคุมผู้เล่นฝั่งหนึ่งด้วยการทำนายจุดตกของลูกบอลแบบวิเคราะห์
+    # ผลทำนายถูกเก็บไว้และคำนวณใหม่เฉพาะเมื่อลูกบอลชนอะไรบางอย่างเท่านั้น
+
+    def __init__(self, side=2, difficulty='normal', seed=None, budget=BUDGET):
+        settings = DIFFICULTIES[difficulty]
+        self.side = side
+        self.difficulty = difficulty
+        self.reaction_ticks = settings['reaction_ticks']
+        self.error = settings['error']
+        self.jump_lead = settings['jump_lead']
+        self.budget = budget
+        self.random = random.Random(seed)
+        if side == 1:
+            self.jump_bit, self.left_bit, self.right_bit = P1_JUMP, P1_LEFT, P1_RIGHT
+        else:
+            self.jump_bit, self.left_bit, self.right_bit = P2_JUMP, P2_LEFT, P2_RIGHT
+        self.reset()
+
+    def reset(self):
+        self.prediction = None  # (x ที่ลูกจะตก, tick ที่จะถึง)
+        self.valid = False
+        self.wait = 0
+        self.last_cost = 0.0
+        self.max_cost = 0.0
+        self.predictions = 0
+
+    def notify(self, events):
+        # ลูกบอลเปลี่ยนทิศ ผลทำนายเดิมใช้ไม่ได้แล้ว
+        # นับเวลาตอบสนองจากครั้งแรกที่ลูกเปลี่ยนทิศ ถ้าเริ่มนับใหม่ทุกครั้งที่ชน ลูกที่เด้งถี่กว่า
+        # reaction_ticks จะทำให้ไม่ได้ทำนายใหม่เลยและยืนนิ่งอยู่ที่เดิมตลอดแมตช์
+        for kind, x, y in events:
+            if kind in _INVALIDATING:
+                if self.valid:
+                    self.wait = self.reaction_ticks
+                self.valid = False
+                return
+
+    def _own_side(self, match, x):
+        middle = match.net.x + match.net.thickness / 2
+        return x > middle if self.side == 2 else x < middle
+
+    def inputs(self, match):
+        start = time.perf_counter()
+        paddle = match.player2 if self.side == 2 else match.player1
+        if self.wait > 0:
+            self.wait -= 1
+        elif not self.valid:
+            predicted = predict_intercept(match, paddle.y + paddle.height, start + self.budget)
+            if predicted is not None:
+                x, ticks = predicted
+                # ลูกยิ่งเร็วยิ่งอ่านยาก การตีโต้ที่เร่งขึ้นเรื่อย ๆ จึงจบลงได้แม้ AI ทั้งสองฝั่งจะเก่ง
+                ball = match.ball
+                error = self.error * max(1.0, math.hypot(ball.vx, ball.vy) / READ_SPEED)
+                self.prediction = (x + self.random.uniform(-error, error), match.tick + ticks)
+                self.valid = True
+                self.predictions += 1
+
+        keys = 0
+        if self.prediction is not None and self._own_side(match, self.prediction[0]):
+            x, arrive_tick = self.prediction
+            target = x + AIM_OFFSET if self.side == 2 else x - AIM_OFFSET
+            remaining = arrive_tick - match.tick
+            if self.jump_lead and 0 <= remaining <= self.jump_lead and abs(paddle.center_x - target) < paddle.width / 2:
+                keys |= self.jump_bit
+        else:
+            # ลูกอยู่ฝั่งตรงข้าม กลับไปรอกลางสนามฝั่งตัวเอง
+            quarter = match.width / 4
+            target = quarter * 3 if self.side == 2 else quarter
+
+        if paddle.center_x < target - DEAD_ZONE:
+            keys |= self.right_bit
+        elif paddle.center_x > target + DEAD_ZONE:
+            keys |= self.left_bit
+
+        self.last_cost = time.perf_counter() - start
+        self.max_cost = max(self.max_cost, self.last_cost)
+        return keys
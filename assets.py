@@ -0,0 +1,89 @@
+import threading
+import time
+
+from kivy.clock import Clock
+from kivy.core.audio import SoundLoader
+from kivy.core.image import Image as CoreImage
+
+BG_IMAGE = 'assets/bg.png'
+MENU_BG_IMAGE = 'assets/sky.png'
+PLAYER1_IMAGE = 'assets/player1.png'
+PLAYER2_IMAGE = 'assets/player2.png'
+MUSIC = 'assets/Aioli - Andrew Langdon.mp3'
+BALL_HIT_SOUND = 'assets/ball_hitted.mp3'
+
+
+class AssetCache:
+    # โหลดรูปและเสียงแต่ละไฟล์เพียงครั้งเดียว แล้วใช้ซ้ำทั้งเกม พร้อมจับเวลาที่ใช้โหลด
+
+    def __init__(self):
+        self.textures = {}
+        self.sounds = {}
+        self.load_times = {}  # path -> วินาทีที่ใช้โหลด
+        self._pending = {}  # path -> callback ที่รอเสียงที่กำลังโหลดอยู่ใน thread
+        self._lock = threading.Lock()
+
+    def texture(self, path):
+        texture = self.textures.get(path)
+        if texture is None:
+            start = time.perf_counter()
+            texture = CoreImage(path).texture
+            self.load_times[path] = time.perf_counter() - start
+            self.textures[path] = texture
+        return texture
+
+    def sound(self, path):
+        if path not in self.sounds:
+            start = time.perf_counter()
+            sound = SoundLoader.load(path)
+            self._store_sound(path, sound, time.perf_counter() - start)
+        return self.sounds[path]
+
+    def sound_voices(self, path, count):
+        # เสียงเอฟเฟกต์ที่ต้องเล่นซ้อนกันได้ต้องมีหลาย instance ตัวแรกใช้ตัวเดียวกับใน cache
+        voices = [self.sound(path)]
+        start = time.perf_counter()
+        voices.extend(SoundLoader.load(path) for _ in range(count - 1))
+        self.load_times[path] += time.perf_counter() - start
+        return voices
+
+    def preload_sound(self, path, callback=None):
+        # ถอดรหัสไฟล์เสียงใหญ่ (เช่นเพลงพื้นหลัง) ใน thread แยกเพื่อไม่ให้หน้าจอค้าง
+        # callback จะถูกเรียกใน main thread ผ่าน Clock เมื่อโหลดเสร็จ
+        with self._lock:
+            if path in self.sounds:
+                if callback:
+                    Clock.schedule_once(lambda dt: callback(self.sounds[path]))
+                return
+            loading = path in self._pending
+            callbacks = self._pending.setdefault(path, [])
+            if callback:
+                callbacks.append(callback)
+            if loading:
+                return  # มี thread กำลังโหลดไฟล์นี้อยู่แล้ว
+        thread = threading.Thread(target=self._load_sound_worker, args=(path,), daemon=True)
+        thread.start()
+
+    def _load_sound_worker(self, path):
+        start = time.perf_counter()
+        sound = SoundLoader.load(path)
+        elapsed = time.perf_counter() - start
+        Clock.schedule_once(lambda dt: self._finish_preload(path, sound, elapsed))
+
+    def _finish_preload(self, path, sound, elapsed):
+        with self._lock:
+            self._store_sound(path, sound, elapsed)
+            callbacks = self._pending.pop(path, [])
+        for callback in callbacks:
+            callback(sound)
+
+    def _store_sound(self, path, sound, elapsed):
+        self.sounds[path] = sound
+        self.load_times[path] = elapsed
+
+    def report(self):
+        lines = [f"  {elapsed * 1000:8.1f} ms  {path}"
+                 for path, elapsed in sorted(self.load_times.items(), key=lambda item: -item[1])]
+        total = sum(self.load_times.values())
+        lines.append(f"  {total * 1000:8.1f} ms  total")
+        return "\n".join(lines)
@@ -0,0 +1,66 @@
+import time
+
+from kivy.clock import Clock
+
+MAX_VOICES = 6  # จำนวนเสียงเอฟเฟกต์ที่เล่นพร้อมกันได้มากที่สุด
+
+
+class SoundMixer:
+    # เล่นเสียงเอฟเฟกต์จาก pool ของ voice ที่โหลดไว้ล่วงหน้า
+    # เหตุการณ์เดียวกันที่เกิดหลายครั้งในเฟรมเดียวจะเล่นแค่ครั้งเดียว
+    # และการสั่งเล่นจริงจะทำในเฟรมถัดไป ไม่ใช่ระหว่างคำนวณฟิสิกส์
+
+    def __init__(self, max_voices=MAX_VOICES, profiler=None):
+        self.max_voices = max_voices
+        self.profiler = profiler
+        self.pools = {}  # ชื่อเอฟเฟกต์ -> รายการ voice
+        self.volumes = {}
+        self._cursor = {}
+        self._pending = set()
+        self._flush_trigger = Clock.create_trigger(self.flush)
+
+    def add_effect(self, name, voices, volume=0.5):
+        voices = [voice for voice in voices if voice]
+        self.pools[name] = voices
+        self._cursor[name] = 0
+        self.set_volume(name, volume)
+
+    def set_volume(self, name, volume):
+        self.volumes[name] = volume
+        for voice in self.pools.get(name, ()):
+            voice.volume = volume
+
+    def trigger(self, name):
+        if name in self.pools:
+            self._pending.add(name)
+            self._flush_trigger()
+
+    def active_voices(self):
+        return sum(1 for pool in self.pools.values() for voice in pool if voice.state == 'play')
+
+    def flush(self, *args):
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        active = self.active_voices()
+        for name in self._pending:
+            pool = self.pools[name]
+            if not pool:
+                continue
+            # voice ถูกใช้วนตามลำดับ ตัวที่ cursor ชี้จึงเป็นตัวที่เริ่มเล่นนานที่สุด
+            cursor = self._cursor[name]
+            index = next((i % len(pool) for i in range(cursor, cursor + len(pool))
+                          if pool[i % len(pool)].state != 'play'), None)
+            if index is None:
+                # ทุก voice ของเอฟเฟกต์นี้กำลังเล่นอยู่ ตัดตัวที่เก่าที่สุดแล้วเล่นใหม่
+                index = cursor
+                pool[index].stop()
+            elif active >= self.max_voices:
+                continue  # เล่นพร้อมกันเต็มจำนวนแล้ว ข้ามเสียงนี้ไป
+            else:
+                active += 1
+            self._cursor[name] = (index + 1) % len(pool)
+            pool[index].play()
+        self._pending.clear()
+        if self.profiler:
+            self.profiler.add('audio', start, time.perf_counter() - start)
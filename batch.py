@@ -0,0 +1,538 @@
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from ai import AIM_OFFSET, BUDGET, DEAD_ZONE, DIFFICULTIES, READ_SPEED, predict_intercept
+from collision import EPSILON, sweep_corner
+from simulation import (
+    MatchState, serve, step,
+    BALL_SIZE, COURT_HEIGHT, COURT_WIDTH, GRAVITY, JUMP_STRENGTH, MAX_BALL_SPEED, MAX_CONTACTS, NET_THICKNESS,
+    PADDLE_HEIGHT, PADDLE_SPEED, PADDLE_WIDTH, SERVE_VELOCITY, SPEED_FACTOR, WIN_SCORE,
+    P1_JUMP, P1_LEFT, P1_RIGHT, P2_JUMP, P2_LEFT, P2_RIGHT,
+)
+
+# บิตของอินพุตแยกตามผู้เล่น (คอลัมน์ 0 = ผู้เล่น 1, คอลัมน์ 1 = ผู้เล่น 2)
+JUMP_BITS = np.array([P1_JUMP, P2_JUMP], dtype=np.uint8)
+LEFT_BITS = np.array([P1_LEFT, P2_LEFT], dtype=np.uint8)
+RIGHT_BITS = np.array([P1_RIGHT, P2_RIGHT], dtype=np.uint8)
+# สิ่งที่ลูกบอลชนในแต่ละรอบของ _sweep_ball
+NO_CONTACT = 0
+WALL = 1
+FLOOR = 2
+NET = 3
+PADDLE_1 = 4  # ผู้เล่นคนที่ i ใช้ PADDLE_1 + i
+
+
+def _overlap(ax, ay, aw, ah, bx, by, bw, bh):
+    # เงื่อนไขเดียวกับ simulation._overlap แต่ทำทีละหลายแมตช์
+    return ~((ax + aw < bx) | (ax > bx + bw) | (ay + ah < by) | (ay > by + bh))
+
+
+class BatchMatch:
+    # เก็บ N แมตช์เป็นอาร์เรย์แยกตามฟิลด์ (structure of arrays)
+    # ใช้ mask แทน if ของแต่ละแมตช์ กฎเหมือน simulation.step โหมด 1 ต่อ 1 ทุกขั้น รวมถึง swept collision
+    # กับผนัง ตาข่าย และผู้เล่น (เด้งได้หลายครั้งต่อ tick) ผลจึงตรงกับ simulation.step ทุกบิต (ดู --check)
+
+    def __init__(self, n, width=COURT_WIDTH, height=COURT_HEIGHT, win_score=WIN_SCORE,
+                 serve_velocity=SERVE_VELOCITY, speed_factor=SPEED_FACTOR, net_height=None):
+        self.n = n
+        self.width = width
+        self.height = height
+        self.win_score = win_score
+
+        # ค่าที่ปรับจูนได้ รับได้ทั้งค่าเดียวหรืออาร์เรย์ยาว n
+        self.serve_vx = np.broadcast_to(np.asarray(serve_velocity[0], dtype=np.float64), (n,)).copy()
+        self.serve_vy = np.broadcast_to(np.asarray(serve_velocity[1], dtype=np.float64), (n,)).copy()
+        self.speed_factor = np.broadcast_to(np.asarray(speed_factor, dtype=np.float64), (n,)).copy()
+        if net_height is None:
+            net_height = height * 2 / 5  # ความสูงของตาข่ายเป็น 2/5 ของความสูงสนาม
+        self.net_height = np.broadcast_to(np.asarray(net_height, dtype=np.float64), (n,)).copy()
+        self.net_x = width / 2 - NET_THICKNESS / 2
+
+        self.ball_x = np.empty(n)
+        self.ball_y = np.empty(n)
+        self.ball_vx = np.empty(n)
+        self.ball_vy = np.empty(n)
+        self.paddle_x = np.empty((n, 2))
+        self.paddle_y = np.empty((n, 2))
+        self.paddle_vy = np.empty((n, 2))
+        self.scores = np.zeros((n, 2), dtype=np.int32)
+        self.serving_player = np.ones(n, dtype=np.int8)  # ผู้ที่จะเริ่มเสิร์ฟ
+        self.winner = np.zeros(n, dtype=np.int8)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.paddle_hits = np.zeros(n, dtype=np.int64)
+        self.bounced = np.zeros(n, dtype=bool)
+        self.rally_ticks = np.zeros(n, dtype=np.int64)
+        self.rallies = np.zeros(n, dtype=np.int64)
+        self.rally_ticks_total = np.zeros(n, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        w, h = self.width, self.height
+        self.paddle_x[mask] = (50, w - 100)
+        self.paddle_y[mask] = h / 2
+        self.paddle_vy[mask] = 0
+        self.ball_x[mask] = w / 2 - BALL_SIZE / 2
+        self.ball_y[mask] = h / 2 - BALL_SIZE / 2
+        self.ball_vx[mask] = self.serve_vx[mask]
+        self.ball_vy[mask] = self.serve_vy[mask]
+        self.scores[mask] = 0
+        self.winner[mask] = 0
+        self.ticks[mask] = 0
+        self.paddle_hits[mask] = 0
+        self.rally_ticks[mask] = 0
+        self.rallies[mask] = 0
+        self.rally_ticks_total[mask] = 0
+
+    def serve(self, mask=None):  # การสลับกันเสิร์ฟ
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        first = self.serving_player == 1
+        server = np.where(first, 0, 1)
+        rows = np.arange(self.n)
+        px = self.paddle_x[rows, server]
+        py = self.paddle_y[rows, server]
+        np.copyto(self.ball_vx, np.where(first, self.serve_vx, -self.serve_vx), where=mask)
+        np.copyto(self.ball_vy, self.serve_vy, where=mask)
+        np.copyto(self.ball_x, px + PADDLE_WIDTH / 2 - BALL_SIZE / 2, where=mask)
+        np.copyto(self.ball_y, py + PADDLE_HEIGHT + BALL_SIZE / 2, where=mask)
+        np.copyto(self.serving_player, np.where(first, 2, 1).astype(np.int8), where=mask)
+
+    def step(self, inputs=None):
+        # เดินทุกแมตช์ไปหนึ่ง tick ตามลำดับเดียวกับ simulation.step คืน mask ของแมตช์ที่มีการได้คะแนนใน tick นี้
+        # self.bounced บอกว่าแมตช์ไหนลูกบอลชนผนัง ผู้เล่น หรือตาข่ายใน tick นี้ (ใช้แทน events ของ simulation.step)
+        active = self.winner == 0
+        a2 = active[:, None]
+        vx, vy = self.ball_vx, self.ball_vy
+        px, py, pvy = self.paddle_x, self.paddle_y, self.paddle_vy
+        w = self.width
+        self.ticks += active
+        self.rally_ticks += active
+        self.bounced[:] = False
+
+        # อัปเดตการเคลื่อนไหวของผู้เล่นตามปุ่มที่กด (ตั้งแต่ต้น tick เหมือน simulation.step)
+        if inputs is not None:
+            keys = np.asarray(inputs, dtype=np.uint8)[:, None]
+            jump = a2 & ((keys & JUMP_BITS) != 0) & (py == 0)
+            pvy[jump] = JUMP_STRENGTH
+            left = a2 & ((keys & LEFT_BITS) != 0) & (px - PADDLE_SPEED >= 0)
+            np.subtract(px, PADDLE_SPEED, out=px, where=left)
+            right = a2 & ((keys & RIGHT_BITS) != 0) & (px + PADDLE_WIDTH + PADDLE_SPEED <= w)
+            np.add(px, PADDLE_SPEED, out=px, where=right)
+
+        np.add(pvy, GRAVITY, out=pvy, where=a2)
+        np.add(py, pvy, out=py, where=a2)
+        grounded = a2 & (py < 0)
+        py[grounded] = 0
+        pvy[grounded] = 0
+
+        # ทำให้ผู้เล่นผ่านตาข่ายไม่ได้
+        net_x = self.net_x
+        blocked = a2 & _overlap(px, py, PADDLE_WIDTH, PADDLE_HEIGHT, net_x, 0, NET_THICKNESS,
+                                self.net_height[:, None])
+        px[blocked[:, 0], 0] = net_x - PADDLE_WIDTH
+        px[blocked[:, 1], 1] = net_x + NET_THICKNESS
+
+        self._resolve_overlaps(active)
+        scored = self._sweep_ball(active)
+
+        # เพิ่มความเร็วของลูกบอล (ลูกที่เพิ่งเสิร์ฟด้วย) สูตรเดียวกับ BallState.increase_speed
+        np.multiply(vx, self.speed_factor, out=vx, where=active)
+        np.multiply(vy, self.speed_factor, out=vy, where=active)
+        speed_sq = vx * vx + vy * vy
+        fast = active & (speed_sq > MAX_BALL_SPEED * MAX_BALL_SPEED)
+        if fast.any():
+            scale = MAX_BALL_SPEED / np.sqrt(speed_sq[fast])
+            vx[fast] *= scale
+            vy[fast] *= scale
+
+        if scored.any():
+            self.rallies += scored
+            self.rally_ticks_total += np.where(scored, self.rally_ticks, 0)
+            self.rally_ticks[scored] = 0
+
+        # ตรวจสอบเงื่อนไขการชนะ
+        self.winner[active & (self.scores[:, 0] >= self.win_score)] = 1
+        self.winner[active & (self.winner == 0) & (self.scores[:, 1] >= self.win_score)] = 2
+        return scored
+
+    def _bounce_off_paddle(self, mask, paddle, push_out):
+        # เหมือน simulation._bounce_off_paddle เฉพาะแมตช์ใน mask
+        bx, vx, vy = self.ball_x, self.ball_vx, self.ball_vy
+        px = self.paddle_x[:, paddle]
+        to_left = bx + BALL_SIZE / 2 < px + PADDLE_WIDTH / 2
+        np.copyto(vx, np.where(to_left, -np.abs(vx), np.abs(vx)), where=mask)
+        if push_out:
+            np.copyto(bx, np.where(to_left, px - BALL_SIZE, px + PADDLE_WIDTH), where=mask)
+        np.abs(vy, out=vy, where=mask)
+
+    def _resolve_overlaps(self, active):
+        # simulation._resolve_overlaps: กรณีที่เริ่ม tick มาก็ซ้อนกันอยู่แล้ว แก้แบบไม่ต่อเนื่อง
+        bx, by, vx = self.ball_x, self.ball_y, self.ball_vx
+        px, py = self.paddle_x, self.paddle_y
+        r = BALL_SIZE / 2
+        pending = active.copy()  # ยังไม่โดนผู้เล่นคนไหน (simulation หยุดที่คนแรกที่ซ้อนอยู่)
+        for paddle in range(2):
+            top = py[:, paddle] + PADDLE_HEIGHT
+            hit = pending & _circle_overlaps(bx + r, by + r, r, px[:, paddle], py[:, paddle],
+                                             px[:, paddle] + PADDLE_WIDTH, top)
+            if not hit.any():
+                continue
+            under = hit & (by + r > top)  # ผู้เล่นกระโดดขึ้นมาใต้ลูกบอล ดันลูกบอลขึ้นไปบนหัว
+            np.copyto(by, top, where=under)
+            self._bounce_off_paddle(under, paddle, False)
+            self._bounce_off_paddle(hit & ~under, paddle, True)
+            self.bounced |= hit
+            self.paddle_hits += hit
+            pending &= ~hit
+        net_x = self.net_x
+        cx = bx + r
+        hit = active & _circle_overlaps(cx, by + r, r, net_x, 0, net_x + NET_THICKNESS, self.net_height)
+        if hit.any():
+            to_left = cx < net_x + NET_THICKNESS / 2
+            np.copyto(bx, np.where(to_left, net_x - BALL_SIZE, net_x + NET_THICKNESS), where=hit)
+            np.copyto(vx, np.where(to_left, -np.abs(vx), np.abs(vx)), where=hit)
+            self.bounced |= hit
+        # อย่าดันลูกบอลออกนอกสนาม
+        np.copyto(bx, np.minimum(np.maximum(bx, 0), self.width - BALL_SIZE), where=active)
+
+    def _sweep_ball(self, active):
+        # simulation._sweep_ball ทีละรอบของการชนกับทุกแมตช์พร้อมกัน แมตช์ที่เดินครบ tick แล้วหลุดออกจาก moving
+        # คืน mask ของแมตช์ที่ลูกบอลตกพื้นใน tick นี้
+        bx, by, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+        px, py = self.paddle_x, self.paddle_y
+        r = BALL_SIZE / 2
+        w, h = self.width, self.height
+        net_x = self.net_x
+        n = self.n
+        remaining = np.ones(n)
+        moving = active.copy()
+        scored = np.zeros(n, dtype=bool)
+        for _ in range(MAX_CONTACTS):
+            if not moving.any():
+                break
+            cx = bx + r
+            cy = by + r
+            dx = vx * remaining
+            dy = vy * remaining
+            best = np.full(n, np.inf)
+            kind = np.full(n, NO_CONTACT, dtype=np.int8)
+            nx = np.zeros(n)
+            ny = np.zeros(n)
+
+            # ผนังด้านบน ซ้าย ขวา และพื้น (ถ้าทะลุไปแล้วถือว่าชนทันที)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for axis, sign, t in ((dy > 0, (0.0, -1.0), (h - r - cy) / dy),
+                                      (dx < 0, (1.0, 0.0), (r - cx) / dx),
+                                      (dx > 0, (-1.0, 0.0), (w - r - cx) / dx),
+                                      (dy < 0, (0.0, 1.0), (r - cy) / dy)):
+                    closer = moving & axis & (t <= 1) & (t < best)
+                    best[closer] = t[closer]
+                    kind[closer] = FLOOR if sign[1] == 1.0 else WALL
+                    nx[closer] = sign[0]
+                    ny[closer] = sign[1]
+
+            # ตาข่ายแล้วตามด้วยผู้เล่นตามลำดับ (ลำดับเดียวกับ grid.query) ผิวที่ถึงก่อนชนะ
+            boxes = [(NET, net_x, 0, net_x + NET_THICKNESS, self.net_height)]
+            for paddle in range(2):
+                boxes.append((PADDLE_1 + paddle, px[:, paddle], py[:, paddle],
+                              px[:, paddle] + PADDLE_WIDTH, py[:, paddle] + PADDLE_HEIGHT))
+            for box, left, bottom, right, top in boxes:
+                hit, t, hit_nx, hit_ny = _sweep_circle_aabb(cx, cy, dx, dy, r, left, bottom, right, top, moving)
+                closer = hit & (t < best)
+                best[closer] = t[closer]
+                kind[closer] = box
+                nx[closer] = hit_nx[closer]
+                ny[closer] = hit_ny[closer]
+
+            free = moving & (kind == NO_CONTACT)
+            np.add(bx, dx, out=bx, where=free)
+            np.add(by, dy, out=by, where=free)
+            moving &= ~free
+            if not moving.any():
+                break
+
+            t = np.maximum(best, 0.0)
+            np.add(bx, dx * t, out=bx, where=moving)
+            np.add(by, dy * t, out=by, where=moving)
+            np.multiply(remaining, 1.0 - t, out=remaining, where=moving)
+
+            # ลูกบอลชนกับด้านล่าง: ได้คะแนนแล้วเสิร์ฟใหม่ จบ tick ของลูกนั้น
+            floor = moving & (kind == FLOOR)
+            if floor.any():
+                left_side = bx + BALL_SIZE / 2 < w / 2
+                self.scores[:, 1] += floor & left_side
+                self.scores[:, 0] += floor & ~left_side
+                self.serve(floor)
+                scored |= floor
+                moving &= ~floor
+
+            for paddle in range(2):
+                self._bounce_off_paddle(moving & (kind == PADDLE_1 + paddle), paddle, False)
+            self.paddle_hits += moving & (kind >= PADDLE_1)
+            dot = vx * nx + vy * ny
+            reflect = moving & (dot < 0)
+            # สะท้อนความเร็วตามผิวที่ชน (ผนัง ตาข่าย หรือใต้ตัวผู้เล่น)
+            np.subtract(vx, 2 * dot * nx, out=vx, where=reflect)
+            np.subtract(vy, 2 * dot * ny, out=vy, where=reflect)
+            self.bounced |= moving
+        return scored
+
+
+def _circle_overlaps(cx, cy, r, left, bottom, right, top):
+    # collision.circle_overlaps_aabb ทีละหลายแมตช์
+    dx = cx - np.minimum(np.maximum(cx, left), right)
+    dy = cy - np.minimum(np.maximum(cy, bottom), top)
+    return dx * dx + dy * dy < r * r
+
+
+def _sweep_circle_aabb(cx, cy, dx, dy, r, left, bottom, right, top, mask):
+    # collision.sweep_circle_aabb ทีละหลายแมตช์ คืน (mask ที่ชน, t, nx, ny)
+    # คำนวณเฉพาะแมตช์ที่กรอบการเคลื่อนที่ของลูกบอลแตะกล่องที่ขยายแล้ว (เผื่อไว้ 1 หน่วย) ซึ่งมีไม่กี่แมตช์
+    n = len(cx)
+    hit = np.zeros(n, dtype=bool)
+    t = np.full(n, np.inf)
+    nx = np.zeros(n)
+    ny = np.zeros(n)
+    left, bottom, right, top = (np.broadcast_to(value, (n,)) for value in (left, bottom, right, top))
+    reach = r + 1.0
+    near = mask & (np.minimum(cx, cx + dx) <= right + reach) & (np.maximum(cx, cx + dx) >= left - reach)
+    near &= (np.minimum(cy, cy + dy) <= top + reach) & (np.maximum(cy, cy + dy) >= bottom - reach)
+    rows = np.flatnonzero(near)
+    if len(rows):
+        hit[rows], t[rows], nx[rows], ny[rows] = _sweep_rows(
+            cx[rows], cy[rows], dx[rows], dy[rows], r, left[rows], bottom[rows], right[rows], top[rows])
+    return hit, t, nx, ny
+
+
+def _sweep_rows(cx, cy, dx, dy, r, left, bottom, right, top):
+    # วิธี slab ของ collision.sweep_circle_aabb กับแมตช์ที่คัดมาแล้ว
+    # การชนที่มุมกล่องเกิดไม่บ่อย จึงส่งต่อให้ collision.sweep_corner ทีละแมตช์ ผลจึงตรงกันทุกบิต
+    ex0, ey0, ex1, ey1 = left - r, bottom - r, right + r, top + r
+    n = len(cx)
+    t_near = np.full(n, -np.inf)
+    t_far = np.full(n, np.inf)
+    nx = np.zeros(n)
+    ny = np.zeros(n)
+    ok = np.ones(n, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for d, c, e0, e1, axis in ((dx, cx, ex0, ex1, 0), (dy, cy, ey0, ey1, 1)):
+            still = d == 0
+            ok &= ~(still & ((c < e0) | (c > e1)))
+            t0 = (e0 - c) / d
+            t1 = (e1 - c) / d
+            swap = t0 > t1
+            t0, t1 = np.where(swap, t1, t0), np.where(swap, t0, t1)
+            nearer = ~still & (t0 > t_near)
+            t_near = np.where(nearer, t0, t_near)
+            normal = np.where(d > 0, -1.0, 1.0)
+            if axis == 0:
+                nx = np.where(nearer, normal, nx)
+                ny = np.where(nearer, 0.0, ny)
+            else:
+                nx = np.where(nearer, 0.0, nx)
+                ny = np.where(nearer, normal, ny)
+            t_far = np.where(still, t_far, np.minimum(t_far, t1))
+    ok &= ~((t_near > t_far) | (t_near > 1) | (t_far < 0))
+    inside = t_near < -EPSILON  # เริ่มต้นอยู่ในกล่องที่ขยายแล้ว
+    ok &= inside | (dx * nx + dy * ny < 0)  # กำลังเคลื่อนที่ออกจากผิว
+    t = np.where(inside, 0.0, np.maximum(t_near, 0.0))
+    hx = np.where(inside, cx, cx + dx * t)
+    hy = np.where(inside, cy, cy + dy * t)
+    corner_x = (hx < left) | (hx > right)
+    corner = ok & corner_x & ((hy < bottom) | (hy > top))
+    hit = ok & ~corner & ~inside
+    for i in np.flatnonzero(corner):
+        contact = sweep_corner(float(cx[i]), float(cy[i]), float(dx[i]), float(dy[i]), r,
+                               float(left[i] if hx[i] < left[i] else right[i]),
+                               float(bottom[i] if hy[i] < bottom[i] else top[i]))
+        if contact is not None:
+            hit[i] = True
+            t[i], nx[i], ny[i] = contact
+    return hit, t, nx, ny
+
+
+def tracking_inputs(batch, out=None):
+    # บอทง่าย ๆ สำหรับจำลองการตีโต้: เดินตามลูกบอลในฝั่งของตัวเองและกระโดดเมื่อบอลอยู่ใกล้
+    if out is None:
+        out = np.zeros(batch.n, dtype=np.uint8)
+    else:
+        out[:] = 0
+    ball_cx = batch.ball_x + BALL_SIZE / 2
+    centers = batch.paddle_x + PADDLE_WIDTH / 2
+    dx = ball_cx[:, None] - centers
+    out |= np.where(dx[:, 0] < -PADDLE_SPEED, P1_LEFT, 0).astype(np.uint8)
+    out |= np.where(dx[:, 0] > PADDLE_SPEED, P1_RIGHT, 0).astype(np.uint8)
+    out |= np.where(dx[:, 1] < -PADDLE_SPEED, P2_LEFT, 0).astype(np.uint8)
+    out |= np.where(dx[:, 1] > PADDLE_SPEED, P2_RIGHT, 0).astype(np.uint8)
+    near = (np.abs(dx) < PADDLE_WIDTH) & (batch.ball_y[:, None] < PADDLE_HEIGHT * 2)
+    out |= np.where(near[:, 0], P1_JUMP, 0).astype(np.uint8)
+    out |= np.where(near[:, 1], P2_JUMP, 0).astype(np.uint8)
+    return out
+
+
+class BatchCpu:
+    # ai.CpuController ของผู้เล่นฝั่ง side ใน N แมตช์พร้อมกัน เรียกแบบเดียวกับ tracking_inputs(batch, out)
+    # แถวที่ i ทำงานเหมือน CpuController(side, difficulty, seed + i) ทุกขั้น (ดู env.py --check)
+    # การทำนายใช้ ai.predict_intercept ทีละแมตช์กับ MatchState สำรอง แต่ทำเฉพาะแมตช์ที่ลูกเพิ่งเปลี่ยนทิศ
+    # ส่วนการเดินไปหาจุดตกและการกระโดดคิดพร้อมกันทุกแมตช์ หลัง batch.step ต้องเรียก notify(batch, scored)
+
+    def __init__(self, n, side=2, difficulty='normal', seed=None, budget=BUDGET):
+        settings = DIFFICULTIES[difficulty]
+        self.n = n
+        self.side = side
+        self.difficulty = difficulty
+        self.reaction_ticks = settings['reaction_ticks']
+        self.error = settings['error']
+        self.jump_lead = settings['jump_lead']
+        self.budget = budget
+        self.randoms = [random.Random(None if seed is None else seed + i) for i in range(n)]
+        if side == 1:
+            self.jump_bit, self.left_bit, self.right_bit = P1_JUMP, P1_LEFT, P1_RIGHT
+        else:
+            self.jump_bit, self.left_bit, self.right_bit = P2_JUMP, P2_LEFT, P2_RIGHT
+        self.has_prediction = np.zeros(n, dtype=bool)
+        self.prediction_x = np.zeros(n)
+        self.arrive_tick = np.zeros(n)
+        self.valid = np.zeros(n, dtype=bool)
+        self.wait = np.zeros(n, dtype=np.int64)
+        self.predictions = 0
+        self._scratch = None
+
+    def seed(self, seed):
+        for i, rng in enumerate(self.randoms):
+            rng.seed(seed + i)
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.has_prediction[mask] = False
+        self.valid[mask] = False
+        self.wait[mask] = 0
+
+    def notify(self, batch, scored):
+        # เหมือน CpuController.notify: ชนผนัง ผู้เล่น ตาข่าย หรือเสิร์ฟใหม่ ผลทำนายเดิมใช้ไม่ได้แล้ว
+        changed = batch.bounced | scored
+        self.wait[changed & self.valid] = self.reaction_ticks
+        self.valid &= ~changed
+
+    def __call__(self, batch, out=None):
+        if out is None:
+            out = np.zeros(self.n, dtype=np.uint8)
+        else:
+            out[:] = 0
+        column = self.side - 1
+        tick = batch.ticks
+        waiting = self.wait > 0
+        self.wait -= waiting
+        for i in np.flatnonzero(~waiting & ~self.valid):
+            self._predict(batch, i, column)
+
+        center = batch.paddle_x[:, column] + PADDLE_WIDTH / 2
+        middle = batch.net_x + NET_THICKNESS / 2
+        own = self.has_prediction & (self.prediction_x > middle if self.side == 2 else self.prediction_x < middle)
+        aim = self.prediction_x + AIM_OFFSET if self.side == 2 else self.prediction_x - AIM_OFFSET
+        target = np.where(own, aim, batch.width / 4 * 3 if self.side == 2 else batch.width / 4)
+        if self.jump_lead:
+            remaining = self.arrive_tick - tick
+            jump = own & (remaining >= 0) & (remaining <= self.jump_lead) & (np.abs(center - target) < PADDLE_WIDTH / 2)
+            out[jump] |= self.jump_bit
+        right = center < target - DEAD_ZONE
+        out[right] |= self.right_bit
+        out[~right & (center > target + DEAD_ZONE)] |= self.left_bit
+        return out
+
+    def _predict(self, batch, i, column):
+        # ai.predict_intercept ต้องการ MatchState จึงคัดลอกลูกบอลและตาข่ายของแมตช์ i ไปใส่ตัวสำรอง
+        start = time.perf_counter()
+        match = self._scratch
+        if match is None or match.width != batch.width or match.height != batch.height:
+            match = self._scratch = MatchState(batch.width, batch.height)
+        ball = match.ball
+        ball.x, ball.y = float(batch.ball_x[i]), float(batch.ball_y[i])
+        ball.vx, ball.vy = float(batch.ball_vx[i]), float(batch.ball_vy[i])
+        match.net.height = float(batch.net_height[i])
+        predicted = predict_intercept(match, float(batch.paddle_y[i, column]) + PADDLE_HEIGHT, start + self.budget)
+        if predicted is None:
+            return
+        x, ticks = predicted
+        error = self.error * max(1.0, math.hypot(ball.vx, ball.vy) / READ_SPEED)
+        self.prediction_x[i] = x + self.randoms[i].uniform(-error, error)
+        self.arrive_tick[i] = int(batch.ticks[i]) + ticks
+        self.has_prediction[i] = True
+        self.valid[i] = True
+        self.predictions += 1
+
+
+def self_test(matches=64, ticks=3000):
+    # เดิน BatchMatch กับ simulation.step ด้วยอินพุตเดียวกันแล้วเทียบสถานะทุก tick ต้องตรงกันทุกบิต
+    # ครึ่งหนึ่งใช้ tracking_inputs (ตีโต้กันจริง) อีกครึ่งกดปุ่มสุ่มค้างไว้ (ชนตาข่าย มุมผู้เล่น ฯลฯ)
+    batch = BatchMatch(matches, win_score=15)
+    batch.serve()
+    states = [MatchState(win_score=15) for _ in range(matches)]
+    for match in states:
+        serve(match)
+    rngs = [random.Random(i) for i in range(matches)]
+    held = [0] * matches
+    hits = 0
+    for tick in range(1, ticks + 1):
+        inputs = tracking_inputs(batch)
+        for i, rng in enumerate(rngs):
+            if rng.random() < 0.1:
+                held[i] = rng.getrandbits(6)
+            if i % 2 == 0:
+                inputs[i] = held[i]
+        for i, match in enumerate(states):
+            hits += sum(kind == 'paddle' for kind, _, _ in step(match, int(inputs[i])))
+        batch.step(inputs)
+        for i, match in enumerate(states):
+            expected = (match.ball.x, match.ball.y, match.ball.vx, match.ball.vy,
+                        match.player1.x, match.player2.x, match.player1.y, match.player2.y,
+                        match.player1.vy, match.player2.vy, match.player1_score, match.player2_score,
+                        match.serving_player, match.winner)
+            actual = (batch.ball_x[i], batch.ball_y[i], batch.ball_vx[i], batch.ball_vy[i],
+                      *batch.paddle_x[i], *batch.paddle_y[i], *batch.paddle_vy[i],
+                      *batch.scores[i], batch.serving_player[i], batch.winner[i])
+            if tuple(map(float, actual)) != tuple(map(float, expected)):
+                print(f"tick {tick}, match {i}: batch {actual} != simulation {expected}, FAILED")
+                return False
+    passed = hits > 0 and hits == batch.paddle_hits.sum()
+    print(f"{matches} matches x {ticks} ticks identical, paddle hits {hits}, {'ok' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="จำลองหลายแมตช์พร้อมกันด้วย NumPy")
+    parser.add_argument('--matches', type=int, default=10000)
+    parser.add_argument('--ticks', type=int, default=3600)
+    parser.add_argument('--serve-speed', type=float, default=SERVE_VELOCITY[0])
+    parser.add_argument('--speed-factor', type=float, default=SPEED_FACTOR)
+    parser.add_argument('--net-height', type=float, default=None)
+    parser.add_argument('--check', action='store_true', help="ตรวจว่าผลตรงกับ simulation.step ทุก tick")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if self_test() else 1)
+
+    batch = BatchMatch(args.matches, serve_velocity=(args.serve_speed, args.serve_speed),
+                       speed_factor=args.speed_factor, net_height=args.net_height)
+    batch.serve()
+    inputs = np.zeros(batch.n, dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        batch.step(tracking_inputs(batch, out=inputs))
+    elapsed = time.perf_counter() - start
+
+    rallies = batch.rallies.sum()
+    print(f"{args.matches * args.ticks / elapsed:,.0f} match-ticks/s ({elapsed:.2f}s)")
+    print(f"finished matches: {(batch.winner != 0).sum()} / {batch.n}")
+    print(f"rallies: {rallies}, mean rally length: {batch.rally_ticks_total.sum() / max(rallies, 1):.1f} ticks")
+    print(f"paddle hits per rally: {batch.paddle_hits.sum() / max(rallies, 1):.2f}")
+
+
+if __name__ == '__main__':
+    main()
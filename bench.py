@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+from ai import CpuController
+from particles import ParticlePool
+from simulation import MODES, PLAYER1_INPUTS, MatchState, kickoff, serve, step
+
+# ทิศทางของแต่ละค่า: 1 = ยิ่งมากยิ่งดี, -1 = ยิ่งน้อยยิ่งดี ค่าที่ไม่อยู่ในนี้ไม่ถูกนำไปเทียบ
+METRICS = {
+    'ticks_per_s': 1,
+    'tick_us_p50': -1,
+    'tick_us_p95': -1,
+    'tick_us_p99': -1,
+    'tick_us_max': -1,
+    'alloc_bytes_per_tick': -1,
+    'retained_blocks_per_tick': -1,
+    'match_ticks_per_s': 1,
+    'cost_us_mean': -1,
+    'cost_us_p95': -1,
+    'build_ms': -1,
+    'first_frame_ms': -1,
+    'cold_ms': -1,
+    'warm_us': -1,
+    'update_us_p50': -1,
+    'update_us_p95': -1,
+    'update_us_max': -1,
+}
+THRESHOLD = 0.15  # ช้าลงเกิน 15% จากค่า baseline นับว่า regression
+BIG_WIN_SCORE = 10 ** 9  # ไม่ให้แมตช์จบระหว่างวัด
+
+
+def percentiles(samples, scale=1e6):
+    # คืน (p50, p95, p99, max) ของเวลาเป็นไมโครวินาที
+    samples = sorted(samples)
+    count = len(samples)
+    pick = lambda p: samples[min(count - 1, int(count * p))] * scale
+    return pick(0.5), pick(0.95), pick(0.99), samples[-1] * scale
+
+
+def scripted_rally(ticks, seed=1):
+    # ให้คอมพิวเตอร์สองฝั่งเล่นกันแล้วเก็บอินพุตไว้ จะได้วัดเฉพาะฟิสิกส์ด้วยอินพุตชุดเดิมทุกครั้ง
+    match = MatchState(win_score=BIG_WIN_SCORE)
+    serve(match)
+    # budget ใหญ่ ๆ ให้ผลทำนายไม่ขึ้นกับความเร็วเครื่อง
+    players = [CpuController(1, 'hard', seed, budget=1.0), CpuController(2, 'hard', seed + 1, budget=1.0)]
+    inputs = array('B')
+    for _ in range(ticks):
+        bits = players[0].inputs(match) | players[1].inputs(match)
+        inputs.append(bits)
+        events = step(match, bits)
+        for player in players:
+            player.notify(events)
+    return inputs
+
+
+def bench_simulation(inputs):
+    match = MatchState(win_score=BIG_WIN_SCORE)
+    serve(match)
+    timer = time.perf_counter
+    samples = array('d', bytes(8 * len(inputs)))
+    start = timer()
+    for index, bits in enumerate(inputs):
+        t = timer()
+        step(match, bits)
+        samples[index] = timer() - t
+    elapsed = timer() - start
+    p50, p95, p99, worst = percentiles(samples)
+    return {'ticks': len(inputs), 'ticks_per_s': len(inputs) / elapsed,
+            'tick_us_p50': p50, 'tick_us_p95': p95, 'tick_us_p99': p99, 'tick_us_max': worst}
+
+
+def bench_party(ticks, seed=1):
+    # โหมด party (ลูกบอล 8 ลูก) ต้องเดินหนึ่ง tick ได้ภายในงบของเฟรม 60 Hz ได้สบาย ๆ
+    balls, paddles = MODES['party']
+    match = MatchState(win_score=BIG_WIN_SCORE, balls=balls, paddles=paddles)
+    kickoff(match)
+    rng = random.Random(seed)
+    held = 0
+    timer = time.perf_counter
+    samples = array('d')
+    start = timer()
+    for _ in range(ticks):
+        if rng.random() < 0.1:
+            held = rng.getrandbits(3 * paddles)
+        t = timer()
+        step(match, held)
+        samples.append(timer() - t)
+    elapsed = timer() - start
+    p50, p95, p99, worst = percentiles(samples)
+    return {'ticks_per_s': ticks / elapsed, 'tick_us_p50': p50, 'tick_us_p95': p95, 'tick_us_p99': p99}
+
+
+def bench_particles(ticks, seed=1):
+    # pool เต็ม budget ตลอด (ชนทุก 3 tick พร้อมหางลูกบอล 8 ลูก) วัดเวลา update ต่อเฟรม
+    pool = ParticlePool(seed=seed)
+    rng = random.Random(seed)
+    timer = time.perf_counter
+    samples = array('d')
+    for tick in range(ticks):
+        if tick % 3 == 0:
+            pool.sparks(rng.uniform(0, 800), rng.uniform(0, 600))
+            pool.dust(rng.uniform(0, 800), 0)
+        for _ in range(8):
+            pool.trail(rng.uniform(0, 800), rng.uniform(0, 600))
+        t = timer()
+        pool.update(1 / 60)
+        samples.append(timer() - t)
+    p50, p95, _, worst = percentiles(samples)
+    return {'update_us_p50': p50, 'update_us_p95': p95, 'update_us_max': worst}
+
+
+def bench_allocations(inputs):
+    # วัดแยกจากความเร็ว เพราะ tracemalloc ทำให้ทุกอย่างช้าลงมาก
+    match = MatchState(win_score=BIG_WIN_SCORE)
+    serve(match)
+    result = {}
+    blocks = sys.getallocatedblocks()
+    for bits in inputs:
+        step(match, bits)
+    result['retained_blocks_per_tick'] = max(0, sys.getallocatedblocks() - blocks) / len(inputs)
+    if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9 ขึ้นไป
+        tracemalloc.start()
+        total = 0
+        for bits in inputs:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step(match, bits)
+            total += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        result['alloc_bytes_per_tick'] = total / len(inputs)
+    return result
+
+
+def bench_ai(ticks, seed=1):
+    match = MatchState(win_score=BIG_WIN_SCORE)
+    serve(match)
+    cpu = CpuController(2, 'hard', seed, budget=1.0)
+    opponent = CpuController(1, 'hard', seed + 1, budget=1.0)
+    samples = array('d')
+    for _ in range(ticks):
+        bits = cpu.inputs(match)
+        samples.append(cpu.last_cost)
+        events = step(match, bits | opponent.inputs(match))
+        cpu.notify(events)
+        opponent.notify(events)
+    p50, p95, _, _ = percentiles(samples)
+    return {'cost_us_mean': sum(samples) / len(samples) * 1e6, 'cost_us_p95': p95, 'predictions': cpu.predictions}
+
+
+def bench_batch(matches, ticks):
+    try:
+        import numpy as np
+        from batch import BatchMatch, tracking_inputs
+    except ImportError as e:
+        return {'skipped': str(e)}
+    batch = BatchMatch(matches)
+    batch.serve()
+    inputs = np.zeros(batch.n, dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        batch.step(tracking_inputs(batch, out=inputs))
+    return {'match_ticks_per_s': matches * ticks / (time.perf_counter() - start)}
+
+
+KIVY_ENV = {
+    'KIVY_NO_ARGS': '1',
+    'KIVY_NO_CONSOLELOG': '1',
+    # หน้าต่าง SDL2 แบบ offscreen ใช้ได้บนเครื่องที่ไม่มีจอ (dummy/mock ทำให้ Kivy ปิดโปรเซสทิ้งทันที)
+    'SDL_VIDEODRIVER': 'offscreen',
+    'KIVY_GL_BACKEND': 'sdl2',
+    'KIVY_WINDOW': 'sdl2',
+}
+KIVY_TIMEOUT = 300  # วินาที
+
+
+def bench_kivy_subprocess(ticks, repeat):
+    # Kivy อาจปิดโปรเซสทิ้งเองถ้าสร้างหน้าต่างไม่ได้ จึงวัดในโปรเซสลูก ถ้าล้มเหลวจะได้ {'skipped': ...} แทน
+    env = dict(os.environ)
+    for name, value in KIVY_ENV.items():
+        env.setdefault(name, value)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'kivy.json')
+        command = [sys.executable, os.path.abspath(__file__), '--ticks', str(ticks), '--repeat', str(repeat),
+                   '--kivy-only', path]
+        try:
+            done = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  text=True, timeout=KIVY_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return {'skipped': f"timed out after {KIVY_TIMEOUT} s"}
+        if done.returncode != 0 or not os.path.exists(path):
+            lines = done.stdout.strip().splitlines()
+            return {'skipped': f"exit code {done.returncode}: {lines[-1] if lines else 'no output'}"}
+        with open(path) as f:
+            return json.load(f)
+
+
+def bench_kivy(ticks, repeat):
+    # วัดส่วนที่ต้องใช้ Kivy โดยไม่เปิดหน้าต่างจริง ถ้าเครื่องนี้ไม่มี Kivy ให้ข้ามไป
+    for name, value in KIVY_ENV.items():
+        os.environ.setdefault(name, value)
+    try:
+        from main import VolleyballApp
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}
+    from kivy.clock import Clock
+
+    results = {}
+    app = VolleyballApp()
+    start = time.perf_counter()
+    app.root = app.build()
+    build = time.perf_counter() - start
+    app._on_first_frame(0)
+    results['startup'] = {'build_ms': build * 1000,
+                          'first_frame_ms': (time.perf_counter() - start) * 1000}
+    # ไม่ใช่ค่าความเร็ว แต่ต้องมีหน้าต่างเหมือนกัน: ตัวละครใน atlas ต้องไม่กลับหัว (main จะจบด้วย error ถ้าไม่ตรง)
+    results['atlas'] = {'mismatched_regions': len(app.game.renderer.atlas.mismatches(app.assets.texture))}
+
+    for name, show in (('show_start_screen', lambda: app.show_start_screen()),
+                       ('show_settings', lambda: app.show_settings(None))):
+        start = time.perf_counter()
+        show()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeat):
+            show()
+        results[name] = {'cold_ms': cold * 1000, 'warm_us': (time.perf_counter() - start) / repeat * 1e6}
+
+    # เล่นแมตช์คอมพิวเตอร์กับคอมพิวเตอร์ผ่าน VolleyballGame.update ทีละเฟรม
+    game = app.game
+    app.start_game(None, difficulty='hard')
+    Clock.unschedule(game.update)  # เรียก update เองแทน Clock
+    game.match.win_score = BIG_WIN_SCORE
+    player1 = CpuController(1, 'hard', 1, budget=1.0)
+    samples = array('d')
+    for _ in range(ticks):
+        game.input.held = player1.inputs(game.match) & PLAYER1_INPUTS
+        start = time.perf_counter()
+        game.update(game.timestep.tick)
+        samples.append(time.perf_counter() - start)
+    p50, p95, _, worst = percentiles(samples)
+    results['game_update'] = {'update_us_p50': p50, 'update_us_p95': p95, 'update_us_max': worst}
+    return results
+
+
+def run(args):
+    inputs = scripted_rally(args.ticks)
+    benchmarks = {
+        'simulation': bench_simulation(inputs),
+        'party': bench_party(args.ticks),
+        'particles': bench_particles(args.ticks),
+        'allocations': bench_allocations(inputs),
+        'ai': bench_ai(args.ticks),
+        'batch': bench_batch(args.batch_matches, args.batch_ticks),
+    }
+    if args.kivy:
+        kivy = bench_kivy_subprocess(args.ticks, args.repeat)
+        if 'skipped' in kivy:
+            benchmarks['kivy'] = kivy
+        else:
+            benchmarks.update(kivy)
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'ticks': args.ticks,
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD, overrides=None):
+    # คืนรายการ (ชื่อ, ค่า baseline, ค่าปัจจุบัน, เปลี่ยนไปกี่เปอร์เซ็นต์, regression หรือไม่)
+    overrides = overrides or {}
+    rows = []
+    for name, metrics in sorted(results['benchmarks'].items()):
+        base_metrics = baseline['benchmarks'].get(name, {})
+        for metric, value in sorted(metrics.items()):
+            direction = METRICS.get(metric)
+            base = base_metrics.get(metric)
+            if direction is None or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            limit = overrides.get(f'{name}.{metric}', overrides.get(metric, threshold))
+            rows.append((f'{name}.{metric}', base, value, change, -change * direction > limit))
+    return rows
+
+
+def parse_threshold(text):
+    name, value = text.split('=')
+    return name, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="วัดประสิทธิภาพของลูปเกมโดยไม่เปิดหน้าต่าง")
+    parser.add_argument('--ticks', type=int, default=3600)
+    parser.add_argument('--repeat', type=int, default=50, help="จำนวนครั้งที่เปิดหน้าเมนูซ้ำ")
+    parser.add_argument('--batch-matches', type=int, default=1000)
+    parser.add_argument('--batch-ticks', type=int, default=600)
+    parser.add_argument('--no-kivy', dest='kivy', action='store_false', help="ข้ามส่วนที่ต้องใช้ Kivy")
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--baseline', help="ไฟล์ผลลัพธ์ที่ใช้เทียบ")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--metric-threshold', type=parse_threshold, action='append', default=[],
+                        metavar='NAME=FRACTION', help="เช่น tick_us_p99=0.5 หรือ simulation.ticks_per_s=0.1")
+    parser.add_argument('--update-baseline', action='store_true', help="บันทึกผลครั้งนี้เป็น baseline ใหม่")
+    parser.add_argument('--kivy-only', metavar='PATH', help=argparse.SUPPRESS)  # ใช้ภายในโดย bench_kivy_subprocess
+    args = parser.parse_args()
+
+    if args.kivy_only:
+        results = bench_kivy(args.ticks, args.repeat)
+        with open(args.kivy_only, 'w') as f:
+            json.dump(results, f)
+        return
+
+    results = run(args)
+    for name, metrics in results['benchmarks'].items():
+        print(f"{name}: " + ", ".join(f"{k} {v:,.2f}" if isinstance(v, float) else f"{k} {v}"
+                                        for k, v in metrics.items()))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+    if results['benchmarks'].get('atlas', {}).get('mismatched_regions'):
+        raise SystemExit("texture atlas regions do not match their source images")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold, dict(args.metric_threshold))
+        regressions = [row for row in rows if row[4]]
+        for name, base, value, change, regressed in rows:
+            print(f"{'REGRESSION' if regressed else 'ok':>10}  {name}: {base:,.2f} -> {value:,.2f} ({change:+.1%})")
+        if regressions:
+            raise SystemExit(f"{len(regressions)} metric(s) regressed beyond the threshold")
+
+
+if __name__ == '__main__':
+    main()
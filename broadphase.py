@@ -0,0 +1,95 @@
+import math
+
+CELL_SIZE = 200  # ใหญ่กว่าผู้เล่นหนึ่งตัว วัตถุส่วนใหญ่จึงอยู่ในช่องไม่เกิน 2-4 ช่อง
+
+
+class UniformGrid:
+    # แบ่งสนามเป็นตารางช่องขนาดเท่ากัน วัตถุถูกใส่ลงทุกช่องที่กล่องของมันทับ
+    # ตอนตรวจการชนให้ถามเฉพาะช่องรอบ ๆ ลูกบอล จึงไม่ต้องเทียบกับวัตถุทุกชิ้นในสนาม
+
+    def __init__(self, width, height, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = max(1, math.ceil(width / cell_size))
+        self.rows = max(1, math.ceil(height / cell_size))
+        self.cells = [[] for _ in range(self.columns * self.rows)]
+        self._spans = {}  # วัตถุ -> ช่วงของช่องที่อยู่ตอนนี้
+        self._order = {}  # วัตถุ -> ลำดับที่ใส่ ใช้เรียงผลลัพธ์ให้เหมือนกันทุกครั้ง
+
+    def _span(self, left, bottom, right, top):
+        # ใช้ if แทน min/max เพราะถูกเรียกทุก tick สำหรับทุกวัตถุ
+        size = self.cell_size
+        last_col = self.columns - 1
+        last_row = self.rows - 1
+        col0 = int(left // size)
+        col1 = int(right // size)
+        row0 = int(bottom // size)
+        row1 = int(top // size)
+        if col0 < 0:
+            col0 = 0
+        elif col0 > last_col:
+            col0 = last_col
+        if col1 > last_col:
+            col1 = last_col
+        elif col1 < 0:
+            col1 = 0
+        if row0 < 0:
+            row0 = 0
+        elif row0 > last_row:
+            row0 = last_row
+        if row1 > last_row:
+            row1 = last_row
+        elif row1 < 0:
+            row1 = 0
+        return col0, col1, row0, row1
+
+    def _cells(self, span):
+        col0, col1, row0, row1 = span
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                yield self.cells[row * self.columns + col]
+
+    def insert(self, item, left, bottom, right, top):
+        # ใส่วัตถุลงตาราง ถ้ามีอยู่แล้วจะย้ายเฉพาะตอนที่ช่องที่ทับเปลี่ยนไป
+        # ผู้เล่นขยับทุก tick แต่ข้ามช่องนาน ๆ ครั้ง ส่วนใหญ่จึงจบแค่การเทียบ tuple
+        span = self._span(left, bottom, right, top)
+        old = self._spans.get(item)
+        if old == span:
+            return
+        if old is None:
+            self._order[item] = len(self._order)
+        else:
+            for cell in self._cells(old):
+                cell.remove(item)
+        self._spans[item] = span
+        for cell in self._cells(span):
+            cell.append(item)
+            if len(cell) > 1:
+                cell.sort(key=self._order.__getitem__)
+
+    def remove(self, item):
+        span = self._spans.pop(item, None)
+        if span is not None:
+            for cell in self._cells(span):
+                cell.remove(item)
+            del self._order[item]
+
+    def clear(self):
+        for cell in self.cells:
+            cell.clear()
+        self._spans.clear()
+        self._order.clear()
+
+    def query(self, left, bottom, right, top):
+        # คืนวัตถุที่อาจชนกับกล่องนี้ (ไม่ซ้ำกัน ตามลำดับที่ใส่ลงไป)
+        col0, col1, row0, row1 = self._span(left, bottom, right, top)
+        if col0 == col1 and row0 == row1:
+            return self.cells[row0 * self.columns + col0]
+        found = []
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                for item in self.cells[row * self.columns + col]:
+                    if item not in found:
+                        found.append(item)
+        if len(found) > 1:
+            found.sort(key=self._order.__getitem__)
+        return found
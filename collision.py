@@ -0,0 +1,92 @@
+import math
+
+EPSILON = 1e-9
+
+
+def circle_overlaps_aabb(cx, cy, r, left, bottom, right, top):
+    # จุดบนกล่องที่ใกล้จุดศูนย์กลางวงกลมที่สุดอยู่ในรัศมีหรือไม่
+    nx = min(max(cx, left), right)
+    ny = min(max(cy, bottom), top)
+    dx = cx - nx
+    dy = cy - ny
+    return dx * dx + dy * dy < r * r
+
+
+def sweep_corner(cx, cy, dx, dy, r, corner_x, corner_y):
+    # ray (cx, cy) + t * (dx, dy) ชนวงกลมรัศมี r ที่มุมกล่อง
+    fx = cx - corner_x
+    fy = cy - corner_y
+    a = dx * dx + dy * dy
+    b = fx * dx + fy * dy
+    c = fx * fx + fy * fy - r * r
+    if a == 0 or b >= 0:
+        return None  # ไม่ได้เคลื่อนที่เข้าหามุม
+    disc = b * b - a * c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / a
+    if t > 1:
+        return None
+    t = max(t, 0.0)
+    nx = fx + dx * t
+    ny = fy + dy * t
+    length = math.hypot(nx, ny) or 1.0
+    return t, nx / length, ny / length
+
+
+def sweep_circle_aabb(cx, cy, dx, dy, r, left, bottom, right, top):
+    # หาเวลาที่ชน (0..1 ของระยะ dx, dy) ระหว่างวงกลมที่เคลื่อนที่กับกล่องที่อยู่นิ่ง
+    # คืนค่า (t, nx, ny) โดย (nx, ny) คือเวกเตอร์ตั้งฉากของผิวที่ชน หรือ None ถ้าไม่ชน
+    # วิธีคือขยายกล่องออกไปด้วยรัศมี r (Minkowski sum) แล้วยิง ray จากจุดศูนย์กลาง
+    ex0, ey0, ex1, ey1 = left - r, bottom - r, right + r, top + r
+    t_near = -math.inf
+    t_far = math.inf
+    nx = ny = 0.0
+
+    if dx == 0:
+        if cx < ex0 or cx > ex1:
+            return None
+    else:
+        t0 = (ex0 - cx) / dx
+        t1 = (ex1 - cx) / dx
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_near:
+            t_near = t0
+            nx, ny = (-1.0 if dx > 0 else 1.0), 0.0
+        t_far = min(t_far, t1)
+
+    if dy == 0:
+        if cy < ey0 or cy > ey1:
+            return None
+    else:
+        t0 = (ey0 - cy) / dy
+        t1 = (ey1 - cy) / dy
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_near:
+            t_near = t0
+            nx, ny = 0.0, (-1.0 if dy > 0 else 1.0)
+        t_far = min(t_far, t1)
+
+    if t_near > t_far or t_near > 1 or t_far < 0:
+        return None
+    if t_near < -EPSILON:
+        # เริ่มต้นอยู่ในกล่องที่ขยายแล้ว: ถ้าอยู่ในส่วนมุมยังอาจชนวงกลมที่มุมได้
+        # ถ้าไม่ใช่แปลว่าซ้อนทับกันอยู่แล้ว ให้ผู้เรียกแก้แบบไม่ต่อเนื่องเอง
+        hx, hy, t = cx, cy, 0.0
+    else:
+        if dx * nx + dy * ny >= 0:
+            return None  # กำลังเคลื่อนที่ออกจากผิว
+        t = max(t_near, 0.0)
+        hx = cx + dx * t
+        hy = cy + dy * t
+
+    # ถ้าจุดชนอยู่ในส่วนมุมของกล่องที่ขยายแล้ว ผิวจริงคือวงกลมรอบมุมนั้น
+    corner_x = left if hx < left else right if hx > right else None
+    corner_y = bottom if hy < bottom else top if hy > top else None
+    if corner_x is not None and corner_y is not None:
+        return sweep_corner(cx, cy, dx, dy, r, corner_x, corner_y)
+    if t_near < -EPSILON:
+        return None
+    return t, nx, ny
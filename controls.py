@@ -0,0 +1,138 @@
+import time
+from array import array
+from collections import deque
+
+from simulation import (
+    P1_JUMP, P1_LEFT, P1_RIGHT, P2_JUMP, P2_LEFT, P2_RIGHT,
+    P3_JUMP, P3_LEFT, P3_RIGHT, P4_JUMP, P4_LEFT, P4_RIGHT,
+)
+
+# keycode -> บิตของอินพุต
+KEYMAP = {
+    119: P1_JUMP,  # ปุ่ม W
+    97: P1_LEFT,  # ปุ่ม A
+    100: P1_RIGHT,  # ปุ่ม D
+    273: P2_JUMP,  # ปุ่มลูกศรขึ้น
+    276: P2_LEFT,  # ปุ่มลูกศรซ้าย
+    275: P2_RIGHT,  # ปุ่มลูกศรขวา
+    105: P3_JUMP,  # ปุ่ม I (โหมด 2 ต่อ 2)
+    106: P3_LEFT,  # ปุ่ม J
+    108: P3_RIGHT,  # ปุ่ม L
+    264: P4_JUMP,  # ปุ่ม 8 บน numpad
+    260: P4_LEFT,  # ปุ่ม 4 บน numpad
+    262: P4_RIGHT,  # ปุ่ม 6 บน numpad
+}
+PROFILER_KEY = 284  # F3 เปิด/ปิดกราฟเวลาของแต่ละเฟรม
+EXPORT_PROFILE_KEY = 285  # F4 บันทึกเวลาของแต่ละเฟรมเป็นไฟล์
+FULLSCREEN_KEY = 292  # F11 สลับเต็มจอ
+PAUSE_KEY = 112  # ปุ่ม P หยุด/เล่นต่อ
+
+# จอยตัวที่ (stickid) -> บิต (กระโดด, ซ้าย, ขวา) ของผู้เล่นที่ควบคุม
+GAMEPADS = {
+    0: (P1_JUMP, P1_LEFT, P1_RIGHT),
+    1: (P2_JUMP, P2_LEFT, P2_RIGHT),
+    2: (P3_JUMP, P3_LEFT, P3_RIGHT),
+    3: (P4_JUMP, P4_LEFT, P4_RIGHT),
+}
+JUMP_BUTTONS = (0, 1)  # ปุ่ม A/B (หรือ ✕/○) ใช้กระโดด
+AXIS_DEADZONE = 16000  # ค่าแกนของ Kivy อยู่ในช่วง -32768..32767
+LATENCY_HISTORY = 256
+
+
+class InputQueue:
+    # รับอินพุตจากคีย์บอร์ดและจอยเป็นเหตุการณ์ที่มีเวลากำกับ แล้วนำไปใช้ตอนเริ่ม tick ถัดไป
+    # พร้อมเก็บเวลาตั้งแต่กดปุ่มจนถึง tick ที่ใช้อินพุตนั้น (input-to-simulation latency)
+
+    def __init__(self, keymap=KEYMAP, gamepads=GAMEPADS, history=LATENCY_HISTORY):
+        self.keymap = dict(keymap)
+        self.gamepads = dict(gamepads)
+        self.events = deque()
+        self.held = 0
+        self._stick_x = {}  # ทิศทางแนวนอนล่าสุดของจอยแต่ละตัว (-1, 0, 1)
+        self.latencies = array('d', bytes(8 * history))
+        self._latency_count = 0
+
+    def bind(self, window):
+        window.bind(on_key_down=self.on_key_down, on_key_up=self.on_key_up,
+                    on_joy_button_down=self.on_joy_button_down,
+                    on_joy_button_up=self.on_joy_button_up,
+                    on_joy_axis=self.on_joy_axis, on_joy_hat=self.on_joy_hat)
+
+    def rebind(self, key, bits):
+        # เปลี่ยนปุ่มของการกระทำ bits ให้เป็น key แทนปุ่มเดิม
+        for old_key in [k for k, v in self.keymap.items() if v == bits]:
+            del self.keymap[old_key]
+        self.keymap[key] = bits
+
+    def push(self, bits, pressed, timestamp=None):
+        self.events.append((time.perf_counter() if timestamp is None else timestamp, bits, pressed))
+
+    def clear(self):
+        self.events.clear()
+        self.held = 0
+        self._stick_x.clear()
+
+    def on_key_down(self, window, key, *args):
+        bits = self.keymap.get(key)
+        if bits:
+            self.push(bits, True)
+
+    def on_key_up(self, window, key, *args):
+        bits = self.keymap.get(key)
+        if bits:
+            self.push(bits, False)
+
+    def on_joy_button_down(self, window, stickid, buttonid):
+        if stickid in self.gamepads and buttonid in JUMP_BUTTONS:
+            self.push(self.gamepads[stickid][0], True)
+
+    def on_joy_button_up(self, window, stickid, buttonid):
+        if stickid in self.gamepads and buttonid in JUMP_BUTTONS:
+            self.push(self.gamepads[stickid][0], False)
+
+    def on_joy_axis(self, window, stickid, axisid, value):
+        if axisid == 0:
+            self._set_stick_x(stickid, -1 if value < -AXIS_DEADZONE else 1 if value > AXIS_DEADZONE else 0)
+
+    def on_joy_hat(self, window, stickid, hatid, value):
+        self._set_stick_x(stickid, value[0])
+
+    def _set_stick_x(self, stickid, direction):
+        # ส่งเหตุการณ์เฉพาะตอนทิศเปลี่ยน ไม่ใช่ทุกครั้งที่แกนขยับ
+        if stickid not in self.gamepads or self._stick_x.get(stickid, 0) == direction:
+            return
+        self._stick_x[stickid] = direction
+        _, left, right = self.gamepads[stickid]
+        now = time.perf_counter()
+        self.push(left, direction < 0, now)
+        self.push(right, direction > 0, now)
+
+    def poll(self, now=None):
+        # เรียกตอนเริ่มแต่ละ tick คืน bitmask ของปุ่มที่ใช้ใน tick นี้
+        # ปุ่มที่กดแล้วปล่อยภายใน tick เดียวยังนับว่ากดใน tick นั้น
+        if now is None:
+            now = time.perf_counter()
+        tapped = 0
+        events = self.events
+        while events:
+            timestamp, bits, pressed = events.popleft()
+            if pressed:
+                self.held |= bits
+                tapped |= bits
+                self._record_latency(now - timestamp)
+            else:
+                self.held &= ~bits
+        return self.held | tapped
+
+    def _record_latency(self, latency):
+        self.latencies[self._latency_count % len(self.latencies)] = latency
+        self._latency_count += 1
+
+    def latency_stats(self):
+        # คืนค่า (เฉลี่ย, p95, สูงสุด) เป็นมิลลิวินาที ของการกดปุ่มล่าสุด
+        count = min(self._latency_count, len(self.latencies))
+        if not count:
+            return 0.0, 0.0, 0.0
+        samples = sorted(self.latencies[:count])
+        p95 = samples[min(count - 1, int(count * 0.95))]
+        return sum(samples) / count * 1000, p95 * 1000, samples[-1] * 1000
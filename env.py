@@ -0,0 +1,299 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from ai import CpuController
+from batch import BatchCpu, BatchMatch
+from simulation import (
+    BALL_SIZE, COURT_HEIGHT, COURT_WIDTH, PADDLE_WIDTH, WIN_SCORE,
+    P1_JUMP, P1_LEFT, P1_RIGHT, P2_JUMP, P2_LEFT, P2_RIGHT, PLAYER1_INPUTS, PLAYER2_INPUTS,
+    MatchState, serve, step,
+)
+
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:  # ใช้ได้โดยไม่ต้องมี gymnasium แค่ไม่มี observation_space/action_space
+    gymnasium = None
+
+# การกระทำ 6 แบบตามปุ่มของผู้เล่นหนึ่งคน: อยู่นิ่ง, ซ้าย, ขวา, กระโดด, กระโดดซ้าย, กระโดดขวา
+ACTIONS = ('noop', 'left', 'right', 'jump', 'jump_left', 'jump_right')
+# ฝั่งขวามองสนามแบบกลับด้าน (ตาข่ายอยู่ทางขวาเหมือนฝั่งซ้ายเสมอ) ซ้าย/ขวาจึงสลับกัน
+# policy เดียวจึงเล่นได้ทั้งสองฝั่ง
+ACTION_BITS = {
+    1: (0, P1_LEFT, P1_RIGHT, P1_JUMP, P1_JUMP | P1_LEFT, P1_JUMP | P1_RIGHT),
+    2: (0, P2_RIGHT, P2_LEFT, P2_JUMP, P2_JUMP | P2_RIGHT, P2_JUMP | P2_LEFT),
+}
+# observation: ลูกบอล (x, y, vx, vy), ตัวเอง (x, y, vy), คู่แข่ง (x, y, vy)
+# ตำแหน่งหารด้วยขนาดสนาม ความเร็วหารด้วย VELOCITY_SCALE ให้ค่าส่วนใหญ่อยู่ราว ๆ -1..1
+OBSERVATION = ('ball_x', 'ball_y', 'ball_vx', 'ball_vy',
+               'x', 'y', 'vy', 'opponent_x', 'opponent_y', 'opponent_vy')
+OBSERVATION_SIZE = len(OBSERVATION)
+VELOCITY_SCALE = 20.0
+MAX_TICKS = 60 * 60 * 5  # ตัดจบ (truncated) ถ้าแมตช์ยาวเกิน 5 นาที
+
+
+class VolleyballEnv(gymnasium.Env if gymnasium else object):
+    # environment แบบ Gymnasium ของผู้เล่นหนึ่งฝั่ง ใช้ simulation.step ตัวเดียวกับเกมจริง (ไม่ต้องเปิด Kivy)
+    # จึงได้ฟิสิกส์และคู่แข่ง (CpuController) แบบเดียวกับในเกม แต่ช้ากว่า VectorVolleyballEnv มาก
+    # reward +1 เมื่อได้คะแนน -1 เมื่อเสียคะแนน จบเมื่อมีผู้ชนะหรือเกิน max_ticks
+    # opponent เป็นชื่อระดับความยากของ CpuController, None (ยืนนิ่ง) หรือ object ที่มี inputs/notify/reset
+    # observation ที่คืนเป็น buffer เดิมทุกครั้ง ถ้าจะเก็บไว้ต้อง copy เอง
+
+    metadata = {'render_modes': []}
+
+    def __init__(self, side=1, opponent='normal', win_score=WIN_SCORE, max_ticks=MAX_TICKS, seed=None):
+        self.side = side
+        self.win_score = win_score
+        self.max_ticks = max_ticks
+        self.action_bits = ACTION_BITS[side]
+        if isinstance(opponent, str):
+            opponent = CpuController(3 - side, opponent, seed)
+        self.opponent = opponent
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        if gymnasium:
+            self.action_space = spaces.Discrete(len(ACTIONS))
+            self.observation_space = spaces.Box(-np.inf, np.inf, (OBSERVATION_SIZE,), np.float32)
+        self.match = None
+
+    def reset(self, seed=None, options=None):
+        if gymnasium:
+            super().reset(seed=seed)
+        self.match = MatchState(win_score=self.win_score)
+        serve(self.match)
+        if self.opponent is not None:
+            if seed is not None and isinstance(self.opponent, CpuController):
+                self.opponent.random.seed(seed)
+            self.opponent.reset()
+        return self._observe(), {}
+
+    def step(self, action):
+        match = self.match
+        inputs = self.action_bits[action]
+        if self.opponent is not None:
+            inputs |= self.opponent.inputs(match) & (PLAYER2_INPUTS if self.side == 1 else PLAYER1_INPUTS)
+        before = match.player1_score - match.player2_score
+        events = step(match, inputs)
+        if events and self.opponent is not None:
+            self.opponent.notify(events)
+        reward = float(match.player1_score - match.player2_score - before)
+        if self.side == 2:
+            reward = -reward
+        terminated = match.winner != 0
+        truncated = not terminated and match.tick >= self.max_ticks
+        return self._observe(), reward, terminated, truncated, {}
+
+    def _observe(self):
+        match = self.match
+        ball = match.ball
+        me, opponent = (match.player1, match.player2) if self.side == 1 else (match.player2, match.player1)
+        obs = self.observation
+        if self.side == 1:
+            obs[0] = ball.x / COURT_WIDTH
+            obs[2] = ball.vx / VELOCITY_SCALE
+            obs[4] = me.x / COURT_WIDTH
+            obs[7] = opponent.x / COURT_WIDTH
+        else:
+            obs[0] = (COURT_WIDTH - BALL_SIZE - ball.x) / COURT_WIDTH
+            obs[2] = -ball.vx / VELOCITY_SCALE
+            obs[4] = (COURT_WIDTH - PADDLE_WIDTH - me.x) / COURT_WIDTH
+            obs[7] = (COURT_WIDTH - PADDLE_WIDTH - opponent.x) / COURT_WIDTH
+        obs[1] = ball.y / COURT_HEIGHT
+        obs[3] = ball.vy / VELOCITY_SCALE
+        obs[5] = me.y / COURT_HEIGHT
+        obs[6] = me.vy / VELOCITY_SCALE
+        obs[8] = opponent.y / COURT_HEIGHT
+        obs[9] = opponent.vy / VELOCITY_SCALE
+        return obs
+
+
+class VectorVolleyballEnv:
+    # n environment ที่เดินพร้อมกันบน BatchMatch (NumPy) สำหรับเทรนบนเครื่องที่มีแต่ CPU
+    # BatchMatch ใช้กฎเดียวกับ simulation.step ทุกบิต และคู่แข่งเริ่มต้นคือ batch.BatchCpu ที่ทำงานเหมือน CpuController
+    # environment ที่ i จึงให้ผลเหมือน VolleyballEnv(opponent=CpuController(..., seed + i)) ทุก step (ดู --check)
+    # opponent เป็นชื่อระดับความยาก, BatchCpu, ฟังก์ชันแบบเดียวกับ batch.tracking_inputs(batch, out) หรือ None (ยืนนิ่ง)
+    # observation/reward/terminated/truncated เป็นอาร์เรย์ที่จองไว้ครั้งเดียวและถูกเขียนทับทุก step
+    # environment ที่จบใน step นี้ถูกรีเซ็ตทันที (ผู้เล่น 1 เสิร์ฟก่อนเหมือน reset) observation ที่คืนจึงเป็นของแมตช์ใหม่แล้ว
+    # observation สุดท้ายของแมตช์ที่จบอยู่ใน info['final_observation'] โดย info['_final_observation'] บอกว่าแถวไหนใช้ได้
+
+    def __init__(self, n, side=1, opponent='normal', win_score=WIN_SCORE, max_ticks=MAX_TICKS, seed=None):
+        self.num_envs = n
+        self.side = side
+        if isinstance(opponent, str):
+            opponent = BatchCpu(n, 3 - side, opponent, seed)
+        self.opponent = opponent
+        self.max_ticks = max_ticks
+        self.batch = BatchMatch(n, win_score=win_score)
+        self.action_bits = np.array(ACTION_BITS[side], dtype=np.uint8)
+        self.opponent_mask = PLAYER2_INPUTS if side == 1 else PLAYER1_INPUTS
+        self.observation = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+        self.reward = np.zeros(n, dtype=np.float32)
+        self.terminated = np.zeros(n, dtype=bool)
+        self.truncated = np.zeros(n, dtype=bool)
+        self._done = np.zeros(n, dtype=bool)
+        self._inputs = np.zeros(n, dtype=np.uint8)
+        self._opponent_inputs = np.zeros(n, dtype=np.uint8)
+        self._margin = np.zeros(n, dtype=np.int32)  # คะแนนตัวเองลบคู่แข่งก่อน step
+        self._flipped = np.zeros(n)
+        self._final_observation = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+        self._info = {}
+        self._final_info = {'final_observation': self._final_observation, '_final_observation': self._done}
+        if gymnasium:
+            self.single_action_space = spaces.Discrete(len(ACTIONS))
+            self.single_observation_space = spaces.Box(-np.inf, np.inf, (OBSERVATION_SIZE,), np.float32)
+            self.action_space = spaces.MultiDiscrete(np.full(n, len(ACTIONS)))
+            self.observation_space = spaces.Box(-np.inf, np.inf, (n, OBSERVATION_SIZE), np.float32)
+
+    def reset(self, seed=None, options=None):
+        self.batch.reset()
+        self.batch.serving_player[:] = 1
+        self.batch.serve()
+        if isinstance(self.opponent, BatchCpu):
+            if seed is not None:
+                self.opponent.seed(seed)
+            self.opponent.reset()
+        return self._observe(), self._info
+
+    def step(self, actions):
+        batch = self.batch
+        np.take(self.action_bits, actions, out=self._inputs)
+        if self.opponent is not None:
+            self.opponent(batch, out=self._opponent_inputs)
+            self._opponent_inputs &= self.opponent_mask
+            self._inputs |= self._opponent_inputs
+        scores = batch.scores
+        me, other = self.side - 1, 2 - self.side
+        np.subtract(scores[:, me], scores[:, other], out=self._margin)
+        scored = batch.step(self._inputs)
+        if isinstance(self.opponent, BatchCpu):
+            self.opponent.notify(batch, scored)
+        # reward = ส่วนต่างคะแนนหลัง step ลบก่อน step
+        np.subtract(scores[:, me], scores[:, other], out=self.reward)
+        self.reward -= self._margin
+        np.not_equal(batch.winner, 0, out=self.terminated)
+        np.greater_equal(batch.ticks, self.max_ticks, out=self.truncated)
+        self.truncated &= ~self.terminated
+        np.logical_or(self.terminated, self.truncated, out=self._done)
+        if not self._done.any():
+            return self._observe(), self.reward, self.terminated, self.truncated, self._info
+        # เก็บ observation ตอนจบไว้ก่อนรีเซ็ต (ใช้ bootstrap ค่าของแมตช์ที่ถูกตัดจบ)
+        np.copyto(self._final_observation, self._observe(), where=self._done[:, None])
+        batch.reset(self._done)
+        batch.serving_player[self._done] = 1
+        batch.serve(self._done)
+        if isinstance(self.opponent, BatchCpu):
+            self.opponent.reset(self._done)
+        return self._observe(), self.reward, self.terminated, self.truncated, self._final_info
+
+    def _observe(self):
+        # หารใน float64 แล้วค่อยเก็บเป็น float32 เหมือน VolleyballEnv._observe ค่าจึงตรงกันทุกบิต
+        batch = self.batch
+        obs = self.observation
+        me, other = self.side - 1, 2 - self.side
+        if self.side == 1:
+            np.divide(batch.ball_x, COURT_WIDTH, out=obs[:, 0])
+            np.divide(batch.ball_vx, VELOCITY_SCALE, out=obs[:, 2])
+            np.divide(batch.paddle_x[:, me], COURT_WIDTH, out=obs[:, 4])
+            np.divide(batch.paddle_x[:, other], COURT_WIDTH, out=obs[:, 7])
+        else:
+            # กลับด้านซ้าย/ขวา: x' = (กว้างสนาม - กว้างวัตถุ - x) / กว้างสนาม
+            flipped = self._flipped
+            np.subtract(COURT_WIDTH - BALL_SIZE, batch.ball_x, out=flipped)
+            np.divide(flipped, COURT_WIDTH, out=obs[:, 0])
+            np.divide(batch.ball_vx, -VELOCITY_SCALE, out=obs[:, 2])
+            np.subtract(COURT_WIDTH - PADDLE_WIDTH, batch.paddle_x[:, me], out=flipped)
+            np.divide(flipped, COURT_WIDTH, out=obs[:, 4])
+            np.subtract(COURT_WIDTH - PADDLE_WIDTH, batch.paddle_x[:, other], out=flipped)
+            np.divide(flipped, COURT_WIDTH, out=obs[:, 7])
+        np.divide(batch.ball_y, COURT_HEIGHT, out=obs[:, 1])
+        np.divide(batch.ball_vy, VELOCITY_SCALE, out=obs[:, 3])
+        np.divide(batch.paddle_y[:, me], COURT_HEIGHT, out=obs[:, 5])
+        np.divide(batch.paddle_vy[:, me], VELOCITY_SCALE, out=obs[:, 6])
+        np.divide(batch.paddle_y[:, other], COURT_HEIGHT, out=obs[:, 8])
+        np.divide(batch.paddle_vy[:, other], VELOCITY_SCALE, out=obs[:, 9])
+        return obs
+
+
+def self_test(args):
+    # เดิน VolleyballEnv หลายตัวคู่กับ VectorVolleyballEnv ด้วย action เดียวกัน observation reward และการจบต้องตรงกันทุก step
+    # ไม่จำกัดเวลาคิดของ AI (budget=inf) การทำนายจะได้ไม่ขึ้นกับความเร็วเครื่อง
+    envs, steps = 16, 3000
+    ok = True
+    for side in (1, 2):
+        rng = np.random.default_rng(args.seed)
+        singles = []
+        for i in range(envs):
+            env = VolleyballEnv(side, CpuController(3 - side, 'normal', budget=math.inf), win_score=3)
+            env.reset(seed=args.seed + i)
+            singles.append(env)
+        vector = VectorVolleyballEnv(envs, side, BatchCpu(envs, 3 - side, 'normal', budget=math.inf), win_score=3)
+        vector.reset(seed=args.seed)
+        episodes = 0
+        failed = None
+        for tick in range(1, steps + 1):
+            actions = rng.integers(0, len(ACTIONS), envs)
+            obs, reward, terminated, truncated, info = vector.step(actions)
+            for i, env in enumerate(singles):
+                expected, expected_reward, done, cut, _ = env.step(int(actions[i]))
+                final = info['final_observation'][i] if done or cut else obs[i]
+                if ((expected != final).any() or expected_reward != reward[i]
+                        or done != terminated[i] or cut != truncated[i]):
+                    failed = failed or (tick, i)
+                if done or cut:
+                    episodes += 1
+                    if (env.reset()[0] != obs[i]).any():
+                        failed = failed or (tick, i)
+            if failed:
+                break
+        passed = not failed and episodes > 0
+        detail = f"step {failed[0]}, env {failed[1]} differs" if failed else f"{episodes} episodes identical"
+        print(f"side {side}: {envs} envs x {steps} steps, {detail}, {'ok' if passed else 'FAILED'}")
+        ok = ok and passed
+    return ok
+
+
+def main():
+    # วัดความเร็วด้วย action สุ่ม เทียบ environment เดี่ยวกับแบบ vectorized
+    parser = argparse.ArgumentParser(description="วัดความเร็วของ environment สำหรับเทรน AI")
+    parser.add_argument('--envs', type=int, default=1024, help="จำนวน environment ของแบบ vectorized")
+    parser.add_argument('--steps', type=int, default=3600)
+    parser.add_argument('--side', type=int, choices=(1, 2), default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--check', action='store_true', help="ตรวจว่า VectorVolleyballEnv ให้ผลเหมือน VolleyballEnv")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if self_test(args) else 1)
+    rng = np.random.default_rng(args.seed)
+
+    env = VolleyballEnv(args.side, seed=args.seed)
+    env.reset(seed=args.seed)
+    actions = rng.integers(0, len(ACTIONS), args.steps)
+    total = 0.0
+    start = time.perf_counter()
+    for action in actions:
+        _, reward, terminated, truncated, _ = env.step(action)
+        total += reward
+        if terminated or truncated:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    print(f"single: {args.steps / elapsed:,.0f} steps/s, reward {total:+.0f}")
+
+    vector = VectorVolleyballEnv(args.envs, args.side, seed=args.seed)
+    vector.reset(seed=args.seed)
+    actions = rng.integers(0, len(ACTIONS), (args.steps, args.envs), dtype=np.uint8)
+    total = 0.0
+    episodes = 0
+    start = time.perf_counter()
+    for row in actions:
+        _, reward, terminated, truncated, _ = vector.step(row)
+        total += reward.sum()
+        episodes += terminated.sum() + truncated.sum()
+    elapsed = time.perf_counter() - start
+    print(f"vector ({args.envs} envs): {args.steps * args.envs / elapsed:,.0f} steps/s, "
+          f"reward {total:+.0f}, finished episodes {episodes}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+from simulation import HIT_NET, HIT_PADDLE, HIT_WALL, POINT, SERVE, WIN
+
+MENU = 'menu'
+SERVING = 'serving'  # ลูกบอลเพิ่งถูกเสิร์ฟ ยังไม่มีใครโดน
+RALLY = 'rally'
+POINT_SCORED = 'point'
+PAUSED = 'paused'
+GAME_OVER = 'game_over'
+ACTIVE = (SERVING, RALLY, POINT_SCORED)  # สถานะที่ลูปเกมต้องเดินทุกเฟรม
+
+# สถานะ -> สถานะที่ไปต่อได้
+TRANSITIONS = {
+    MENU: (SERVING,),
+    SERVING: (RALLY, POINT_SCORED, PAUSED, MENU),
+    RALLY: (POINT_SCORED, PAUSED, MENU),
+    POINT_SCORED: (SERVING, GAME_OVER, PAUSED, MENU),
+    PAUSED: (SERVING, RALLY, POINT_SCORED, MENU),
+    GAME_OVER: (SERVING, MENU),
+}
+_HITS = (HIT_WALL, HIT_PADDLE, HIT_NET)
+
+
+class MatchFlow:
+    # ลำดับของแมตช์เป็น state machine ที่เปลี่ยนตามเหตุการณ์จาก simulation.step แทนการเช็กคะแนนทุกเฟรม
+    # ทุกครั้งที่เปลี่ยนสถานะจะเรียก listener(สถานะเดิม, สถานะใหม่) ตามลำดับที่ bind ไว้
+    # ไม่ใช้ Kivy จึงใช้กับโหมดที่ไม่มีหน้าต่างได้เหมือน simulation
+
+    def __init__(self):
+        self.state = MENU
+        self.resume_state = None  # สถานะก่อนหยุดชั่วคราว
+        self.listeners = []
+
+    @property
+    def active(self):
+        return self.state in ACTIVE
+
+    def bind(self, listener):
+        self.listeners.append(listener)
+
+    def go(self, state):
+        old = self.state
+        if state == old:
+            return
+        if state not in TRANSITIONS[old]:
+            raise ValueError(f"cannot go from {old} to {state}")
+        self.state = state
+        for listener in self.listeners:
+            listener(old, state)
+
+    def start(self):
+        # เริ่มแมตช์ใหม่ (ลูกแรกถูกเสิร์ฟไปแล้ว)
+        self.resume_state = None
+        if self.state not in (MENU, GAME_OVER):
+            self.go(MENU)
+        self.go(SERVING)
+
+    def on_events(self, events, finish=True):
+        # POINT ตามด้วย SERVE ใน tick เดียวกัน จึงผ่าน POINT_SCORED แล้วกลับมา SERVING ทันที
+        # finish=False ไม่จบแมตช์จาก WIN (โหมดเน็ตเวิร์กที่ tick ล่าสุดยังอาจถูก rollback)
+        for kind, x, y in events:
+            if kind in _HITS:
+                if self.state == SERVING:
+                    self.go(RALLY)
+            elif kind == POINT:
+                self.go(POINT_SCORED)
+            elif kind == SERVE:
+                self.go(SERVING)
+            elif kind == WIN and finish:
+                self.finish()
+
+    def pause(self):
+        if self.active:
+            self.resume_state = self.state
+            self.go(PAUSED)
+
+    def resume(self):
+        if self.state == PAUSED:
+            self.go(self.resume_state)
+
+    def toggle_pause(self):
+        if self.state == PAUSED:
+            self.resume()
+        else:
+            self.pause()
+
+    def finish(self):
+        # จบแมตช์โดยไม่ได้มาจาก WIN ใน events (เช่นโหมดเน็ตเวิร์กที่รอให้อินพุตยืนยันครบก่อน)
+        if self.state != GAME_OVER:
+            if self.state != POINT_SCORED:
+                self.go(POINT_SCORED)
+            self.go(GAME_OVER)
+
+    def quit(self):
+        self.go(MENU)
@@ -3,127 +3,87 @@ from kivy.uix.widget import Widget
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.floatlayout import FloatLayout
-from kivy.vector import Vector
 from kivy.clock import Clock
-from kivy.graphics import Rectangle, Color, Ellipse
+from kivy.config import Config
+from kivy.graphics import Rectangle, Color, PopMatrix, PushMatrix, Scale, Translate
 from kivy.core.window import Window
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.slider import Slider
-from kivy.core.audio import SoundLoader
 from kivy.uix.image import Image
+import argparse
+import os
+import time
+
+from ai import DIFFICULTIES, CpuController
+from audio import SoundMixer
+from controls import EXPORT_PROFILE_KEY, FULLSCREEN_KEY, PAUSE_KEY, PROFILER_KEY, InputQueue
+from flow import ACTIVE, GAME_OVER, PAUSED, SERVING, MatchFlow
+from netplay import FLUSH_INTERVAL, RollbackSession, UdpTransport, add_arguments
+from particles import ParticlePool
+from profiler import FrameProfiler
+from replay import ReplayRecorder
+from screens import ScreenGraph
+from assets import (
+    BALL_HIT_SOUND, BG_IMAGE, MENU_BG_IMAGE, MUSIC, PLAYER1_IMAGE, PLAYER2_IMAGE,
+    AssetCache,
+)
+
+from render import CourtRenderer, ParticleRenderer, ProfilerOverlay, TextureAtlas
+from simulation import (
+    BALL_SIZE, COURT_HEIGHT, COURT_WIDTH, HIT_NET, HIT_PADDLE, HIT_WALL, INPUT_BITS, MODES, POINT, SERVE,
+    PLAYER1_INPUTS, MatchState, kickoff, reset_match, step,
+)
+from timestep import FixedTimestep
+
+REPLAY_DIR = 'replays'
+PROFILE_DIR = 'profiles'
+TRAIL_TICKS = 20  # ลูกบอลมีหางต่ออีกกี่ tick หลังถูกตี
+IDLE_FPS = 20  # เมนู หยุดชั่วคราว และจบเกม ไม่มีอะไรขยับ Kivy ตื่นแค่พอรับอินพุต
+
+
+def set_clock_rate(fps):
+    # Kivy อ่าน maxfps จาก Config ตอนเริ่มเท่านั้น ถ้าจะเปลี่ยนระหว่างทำงานต้องตั้งที่ Clock ตรง ๆ
+    Clock._max_fps = float(fps)
 
-class Paddle(Widget):
-    def __init__(self, image_source, **kwargs):
-        super().__init__(**kwargs)
-        self.size = (100, 150)
-        self.velocity = Vector(0, 0)
-        self.gravity = -0.5
-        self.jump_strength = 10
-        self.speed = 7  # ความเร็วของผู้เล่น
-        with self.canvas:
-            self.image = Image(source=image_source, size=self.size, pos=self.pos)
-        self.bind(pos=self.update_graphics_pos, size=self.update_graphics_pos)
-
-    def update_graphics_pos(self, *args):
-        self.image.pos = self.pos
-        self.image.size = self.size
-
-    def move(self):
-        self.velocity.y += self.gravity
-        self.y += self.velocity.y
-        if self.y < 0:
-            self.y = 0
-            self.velocity.y = 0
-
-    def jump(self):
-        if self.y == 0:
-            self.velocity.y = self.jump_strength
-
-    def move_left(self):
-        if self.x - self.speed >= 0:  # ป้องกันไม่ให้เคลื่อนที่ออกนอกขอบด้านซ้าย
-            self.x -= self.speed
-
-    def move_right(self):
-        if self.right + self.speed <= self.parent.width:  # ป้องกันไม่ให้เคลื่อนที่ออกนอกขอบด้านขวา
-            self.x += self.speed
-
-class Ball(Widget):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.velocity = Vector(6, 6)
-        self.size = (30, 30)
-        with self.canvas:
-            Color(1, 1, 0)
-            self.ellipse = Ellipse(size=self.size, pos=self.pos)
-        self.bind(pos=self.update_graphics_pos, size=self.update_graphics_pos)
-
-    def update_graphics_pos(self, *args):
-        self.ellipse.pos = self.pos
-        self.ellipse.size = self.size
-
-    def move(self):
-        self.pos = Vector(*self.velocity) + self.pos
-
-    def increase_speed(self, factor=1.001):
-        self.velocity = self.velocity * factor
-
-class Net(Widget):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.size_hint_y = None
-        self.height = 180  # ความสูงของตาข่าย
-        self.thickness = 10  # ความหนาของตาข่าย
-        with self.canvas:
-            Color(0, 0, 0)
-            self.rect = Rectangle(size=(self.thickness, self.height), pos=self.pos)
-        self.bind(pos=self.update_graphics_pos, size=self.update_graphics_pos)
-
-    def update_graphics_pos(self, *args):
-        self.rect.pos = self.pos
-        self.rect.size = self.size
-
-    def set_height(self, height):
-        self.height = height
-        self.size = (self.thickness, self.height)
-        self.update_graphics_pos()
-
-    def set_thickness(self, thickness):
-        self.thickness = thickness
-        self.size = (self.thickness, self.height)
-        self.update_graphics_pos()
 
 class VolleyballGame(Widget):
-    def __init__(self, **kwargs):
+    def __init__(self, assets, mixer, profiler, particles, **kwargs):
         super().__init__(**kwargs)
+        self.mixer = mixer
+        self.profiler = profiler
+        self.particles = particles  # เอฟเฟกต์ตอนชน ใช้แค่แสดงผล ไม่มีผลกับ match
+        self._trail_ticks = 0
+        # ทุกอย่างในเกมรวมถึง widget ลูก (คะแนน ปุ่ม) อยู่ในพิกัดสนาม COURT_WIDTH x COURT_HEIGHT
+        # แล้วย่อ/ขยายให้พอดีหน้าต่างด้วย Translate + Scale ชุดเดียว ส่วนที่เหลือของจอเป็นแถบดำ (letterbox)
+        with self.canvas.before:
+            PushMatrix()
+            self.view_translate = Translate()
+            self.view_scale = Scale(1)
+            self.bg = Rectangle(texture=assets.texture(BG_IMAGE), size=(COURT_WIDTH, COURT_HEIGHT), pos=(0, 0))
         with self.canvas:
             Color(0.5, 0.5, 0.5, 1) 
-            self.platform = Rectangle(size=(self.width, 50), pos=(0, 0))
-            self.bind(size=self._update_rect, pos=self._update_rect)
-        with self.canvas.before:
-            self.bg_image = Image(source='assets/bg.png', allow_stretch=True, keep_ratio=False)
-            self.bg = Rectangle(size=self.size, pos=self.pos)
-            self.canvas.add(self.bg_image.canvas)
-
-        self.player1 = Paddle(image_source='assets/player1.png', pos=(50, self.height / 2))
-        self.add_widget(self.player1)
-
-        self.player2 = Paddle(image_source='assets/player2.png', pos=(self.width - 100, self.height / 2))
-        self.add_widget(self.player2)
-
-        self.ball = Ball(center=self.center)
-        self.add_widget(self.ball)
-
-        self.net = Net(pos=(self.width / 2 - 5, 0))
-        self.add_widget(self.net)
-
-        self.player1_score = 0
-        self.player2_score = 0
+            self.platform = Rectangle(size=(COURT_WIDTH, 50), pos=(0, 0))
+        with self.canvas.after:
+            PopMatrix()
+        self._view = (0, 0, 1)  # (x, y, scale) ของมุมซ้ายล่างสนามบนหน้าต่าง
+
+        # สถานะของเกมทั้งหมดอยู่ใน match ส่วน widget มีไว้แสดงผลเท่านั้น
+        self.match = MatchState()
+        self.timestep = FixedTimestep(self._tick)
+        self._previous = self._positions()
+
+        atlas = TextureAtlas([PLAYER1_IMAGE, PLAYER2_IMAGE], assets.texture)
+        self.renderer = CourtRenderer(self.canvas, atlas, PLAYER1_IMAGE, PLAYER2_IMAGE)
+        self.renderer.set_net(self.match.net)
+        self.particle_renderer = ParticleRenderer(self.canvas, particles)
+        self._sync_widgets()
+        self._hud_state = None  # (คะแนนผู้เล่น 1, คะแนนผู้เล่น 2, ผู้ชนะ) ที่แสดงอยู่บนจอ
 
         self.score_label = Label(
             text="Player 1: 0 | Player 2: 0",
             size_hint=(None, None),
             size=(200, 50),
-            pos=(self.width / 2 - 100, self.height - 50),  # ตำแหน่งคะแนน
+            pos=(COURT_WIDTH / 2 - 100, COURT_HEIGHT - 50),  # ตำแหน่งคะแนน
         )
         self.add_widget(self.score_label)
 
@@ -131,7 +91,7 @@ class VolleyballGame(Widget):
             text="",
             size_hint=(None, None),
             size=(200, 50),
-            pos=(self.width / 2 - 100, self.height / 2),  # ตำแหน่งข้อความชนะ
+            pos=(COURT_WIDTH / 2 - 100, COURT_HEIGHT / 2),  # ตำแหน่งข้อความชนะ
         )
         self.add_widget(self.win_label)
 
@@ -139,7 +99,7 @@ class VolleyballGame(Widget):
             text="Replay",
             size_hint=(None, None),
             size=(100, 50),
-            pos=(self.width / 2 - 50, self.height / 2 - 100),
+            pos=(COURT_WIDTH / 2 - 50, COURT_HEIGHT / 2 - 100),
             on_press=self.replay_game,
         )
         self.replay_button.opacity = 0  # ซ่อนปุ่มในตอนแรก
@@ -149,201 +109,407 @@ class VolleyballGame(Widget):
             text="Back to Main Menu",
             size_hint=(None, None),
             size=(200, 50),
-            pos=(self.width / 2 - 100, self.height / 2 - 160),
+            pos=(COURT_WIDTH / 2 - 100, COURT_HEIGHT / 2 - 160),
             on_press=self.back_to_main_menu,
         )
         self.back_to_menu_button.opacity = 0  # ซ่อนปุ่มในตอนแรก
         self.add_widget(self.back_to_menu_button)
 
-        self.bind(size=self._update_bg, pos=self._update_bg)
-        self.bind(size=self._update_positions)
-
-        Window.bind(on_key_down=self.on_key_down)
-        Window.bind(on_key_up=self.on_key_up)
-
-        self.keys_pressed = set()
-        self.serving_player = 1  # ผู้ที่จะเริ่มเสิร์ฟ
-    def _update_rect(self, *args):
-        self.platform.size = (self.width, 50)
-        self.platform.pos = (0, 0)
+        self.net_label = Label(
+            text="",
+            size_hint=(None, None),
+            size=(260, 80),
+            halign='left',
+            pos=(10, COURT_HEIGHT - 90),  # สถิติเน็ตเวิร์กมุมซ้ายบน
+        )
+        self.add_widget(self.net_label)
 
-    def _update_bg(self, *args):
-        self.bg.size = self.size
-        self.bg.pos = self.pos
-        self.bg_image.size = self.size
-        self.bg_image.pos = self.pos
-
-    def _update_positions(self, *args):
-        self.player1.pos = (50, self.height / 2)
-        self.player2.pos = (self.width - 100, self.height / 2)
-        self.ball.center = self.center
-        self.score_label.pos = (self.width / 2 - 100, self.height - 50)  
-        self.win_label.pos = (self.width / 2 - 100, self.height / 2) 
-        self.replay_button.pos = (self.width / 2 - 50, self.height / 2 - 100)
-        self.back_to_menu_button.pos = (self.width / 2 - 100, self.height / 2 - 160)
-        self.net.pos = (self.width / 2 - self.net.thickness / 2, 0)
-        self.net.set_height(self.height * 2 / 5)  #ความสูงของตาข่ายเป็น 2/5 ของความสูงหน้าจอ
-
-    def serve_ball(self, velocity=(6, 6)):#การสลับกันเสิร์ฟ
-        if self.serving_player == 1:
-            self.ball.center = (self.player1.center_x, self.player1.top + self.ball.height)
-            self.ball.velocity = Vector(*velocity)
-            self.serving_player = 2  #เสิร์ฟครั้งต่อไปจะเป็นผู้เล่น 2
+        self.profiler_overlay = ProfilerOverlay(
+            profiler,
+            size_hint=(None, None),
+            size=(300, 220),
+            pos=(COURT_WIDTH - 310, COURT_HEIGHT - 230),  # มุมขวาบน ซ่อนไว้จนกด F3
+        )
+        self.add_widget(self.profiler_overlay)
+
+        self.bind(size=self._update_view, pos=self._update_view)
+        self._update_view()
+
+        self.input = InputQueue()
+        self.input.bind(Window)
+        Window.bind(on_key_down=self._on_debug_key, on_flip=self._on_flip, on_minimize=self._on_minimize)
+        self.cpu = None  # CpuController เมื่อเล่นกับคอมพิวเตอร์
+        self.recorder = None  # บันทึก replay ของแมตช์ที่กำลังเล่น
+        self.session = None  # RollbackSession เมื่อเล่นผ่านเน็ตเวิร์ก
+        self._resim_peak = 0
+        self.active_fps = Config.getint('graphics', 'maxfps')
+        self.flow = MatchFlow()
+        self.flow.bind(self._on_state)
+        set_clock_rate(IDLE_FPS)  # เริ่มที่เมนู
+
+    @property
+    def player1_score(self):
+        return self.match.player1_score
+
+    @property
+    def player2_score(self):
+        return self.match.player2_score
+
+    def _update_view(self, *args):
+        # เปลี่ยนขนาดหน้าต่างหรือเต็มจอแค่ปรับ matrix สนามและวัตถุในเกมไม่ขยับเลย
+        scale = max(min(self.width / COURT_WIDTH, self.height / COURT_HEIGHT), 1e-6)
+        x = self.x + (self.width - COURT_WIDTH * scale) / 2
+        y = self.y + (self.height - COURT_HEIGHT * scale) / 2
+        self._view = (x, y, scale)
+        self.view_translate.xy = (x, y)
+        self.view_scale.xyz = (scale, scale, 1)
+
+    def _to_court(self, x, y):
+        vx, vy, scale = self._view
+        return (x - vx) / scale, (y - vy) / scale
+
+    # ปุ่มต่าง ๆ อยู่ในพิกัดสนาม ตำแหน่งที่แตะจึงต้องแปลงก่อนส่งต่อ (แบบเดียวกับ RelativeLayout)
+    def on_touch_down(self, touch):
+        touch.push()
+        touch.apply_transform_2d(self._to_court)
+        try:
+            return super().on_touch_down(touch)
+        finally:
+            touch.pop()
+
+    def on_touch_move(self, touch):
+        touch.push()
+        touch.apply_transform_2d(self._to_court)
+        try:
+            return super().on_touch_move(touch)
+        finally:
+            touch.pop()
+
+    def on_touch_up(self, touch):
+        touch.push()
+        touch.apply_transform_2d(self._to_court)
+        try:
+            return super().on_touch_up(touch)
+        finally:
+            touch.pop()
+
+    def _positions(self):
+        positions = []
+        for item in self.match.balls:
+            positions += (item.x, item.y)
+        for item in self.match.paddles:
+            positions += (item.x, item.y)
+        return positions
+
+    def _sync_widgets(self, alpha=1.0):
+        # คัดลอกสถานะจาก match ไปยังภาพบนจอ
+        # alpha < 1 คือวาดตำแหน่งระหว่าง tick ก่อนหน้ากับ tick ปัจจุบัน
+        current = self._positions()
+        if alpha >= 1.0:
+            self.renderer.sync(current)
         else:
-            self.ball.center = (self.player2.center_x, self.player2.top + self.ball.height)
-            self.ball.velocity = Vector(-velocity[0], velocity[1])
-            self.serving_player = 1  #เสิร์ฟครั้งต่อไปจะเป็นผู้เล่น 1
-        print(f"Ball served at {self.ball.center} with velocity {self.ball.velocity}")
+            self.renderer.sync([prev + (cur - prev) * alpha
+                                for prev, cur in zip(self._previous, current)])
+
+    def _update_hud(self):
+        # เปลี่ยนข้อความเฉพาะตอนคะแนนหรือผู้ชนะเปลี่ยน เพราะการตั้ง Label.text ต้องสร้าง texture ใหม่
+        match = self.match
+        state = (match.player1_score, match.player2_score, match.winner)
+        if state == self._hud_state:
+            return
+        self._hud_state = state
+        side = "Team" if len(match.paddles) > 2 else "Player"
+        self.score_label.text = f"{side} 1: {match.player1_score} | {side} 2: {match.player2_score}"
+        if match.winner:
+            self.win_label.text = f"{side} {match.winner} Wins!"
+            if not self.session:  # แมตช์เน็ตเวิร์กเริ่มใหม่ฝั่งเดียวไม่ได้
+                self.replay_button.opacity = 1  # แสดงปุ่ม replay
+            self.back_to_menu_button.opacity = 1  # แสดงปุ่ม back to menu
+        else:
+            self.win_label.text = ""
+            self.replay_button.opacity = 0  # ซ่อนปุ่ม replay
+            self.back_to_menu_button.opacity = 0  # ซ่อนปุ่ม back to menu
 
-    def update(self, dt):
-        self.ball.move()
-        self.player1.move()
-        self.player2.move()
-
-        # เพิ่มความเร็วของลูกบอล
-        self.ball.increase_speed()
-
-        # การชนของลูกบอลกับด้านบน
-        if self.ball.top > self.height:
-            self.ball.velocity.y *= -1
-            App.get_running_app().ball_hit_sound.play()
-
-        # ลูกบอลชนกับด้านซ้ายและขวา
-        if self.ball.x < 0 or self.ball.right > self.width:
-            self.ball.velocity.x *= -1
-            App.get_running_app().ball_hit_sound.play()
-
-        # ลูกบอลชนกับด้านล่าง
-        if self.ball.y < 0:
-            if self.ball.center_x < self.width / 2:
-                self.player2_score += 1
-            else:
-                self.player1_score += 1
-            self.serve_ball(velocity=(6, 6))
+    def serve_ball(self, velocity=None):#การสลับกันเสิร์ฟ
+        kickoff(self.match, velocity)
+        self._previous = self._positions()
+        self._sync_widgets()
+        self._log_serve()
 
-        # ตรวจสอบเงื่อนไขการชนะ
-        if self.player1_score >= 7:
-            self.win_label.text = "Player 1 Wins!"
-            self.replay_button.opacity = 1  # แสดงปุ่ม replay
-            self.back_to_menu_button.opacity = 1  # แสดงปุ่ม back to menu
-            Clock.unschedule(self.update)  # หยุดเกม
-        elif self.player2_score >= 7:
-            self.win_label.text = "Player 2 Wins!"
-            self.replay_button.opacity = 1  # แสดงปุ่ม replay
-            self.back_to_menu_button.opacity = 1  # แสดงปุ่ม back to menu
-            Clock.unschedule(self.update)  # หยุดเกม
+    def _log_serve(self):
+        ball = self.match.ball
+        print(f"Ball served at {(ball.center_x, ball.y + ball.size / 2)} with velocity {(ball.vx, ball.vy)}")
 
-        # การชนของลูกบอลกับผู้เล่น
-        if self.ball.collide_widget(self.player1):
-            if self.ball.center_x < self.player1.center_x:
-                self.ball.velocity.x = -abs(self.ball.velocity.x)  # ทำให้ลูกบอลกระเด็นไปทางซ้าย
-                self.ball.right = self.player1.x  # ปรับตำแหน่งลูกบอลไปทางซ้ายของผู้เล่น
-            else:
-                self.ball.velocity.x = abs(self.ball.velocity.x)  # ทำให้ลูกบอลกระเด็นไปทางขวา
-                self.ball.x = self.player1.right  # ปรับตำแหน่งลูกบอลไปทางขวาของผู้เล่น
-            self.ball.velocity.y = abs(self.ball.velocity.y)  # ทำให้ลูกบอลกระเด็นขึ้น
-            App.get_running_app().ball_hit_sound.play()       
-        elif self.ball.collide_widget(self.player2):
-            if self.ball.center_x < self.player2.center_x:
-                self.ball.velocity.x = -abs(self.ball.velocity.x)  # ทำให้ลูกบอลกระเด็นไปทางซ้าย
-                self.ball.right = self.player2.x  # ปรับตำแหน่งลูกบอลไปทางซ้ายของผู้เล่น
+    def update(self, dt):
+        profiler = self.profiler
+        profiler.begin_frame()
+        alpha = self.timestep.advance(dt)
+        self._sync_widgets(alpha)
+        self.particles.update(dt)
+        self.particle_renderer.sync()
+        profiler.lap('render')
+        if self.session:
+            self._update_hud()  # rollback ย้อนคะแนนได้ จึงยังต้องเช็กทุกเฟรม
+            profiler.lap('hud')
+            self._resim_peak = max(self._resim_peak, self.session.take_frame_stats())
+            if self.session.finished:
+                self.flow.finish()
+
+    def _use_match(self, match):
+        # เปลี่ยนไปใช้แมตช์ใหม่ (เช่นเปลี่ยนโหมด) จำนวนลูกบอลหรือผู้เล่นอาจไม่เท่าเดิม
+        self.match = match
+        self.particles.clear()
+        self.renderer.set_entities(len(match.balls), len(match.paddles))
+        self.renderer.set_net(match.net)
+        self._previous = self._positions()
+        self._sync_widgets()
+        self._update_hud()
+
+    def set_mode(self, mode='classic'):
+        balls, paddles = MODES[mode]
+        if (len(self.match.balls), len(self.match.paddles)) != (balls, paddles):
+            self._use_match(MatchState(balls=balls, paddles=paddles))
+
+    def set_cpu(self, difficulty=None):
+        # difficulty=None คือโหมดผู้เล่น 2 คน
+        self.cpu = CpuController(side=2, difficulty=difficulty) if difficulty else None
+
+    def _tick(self):
+        if not self.flow.active:
+            return  # แมตช์จบไปแล้วระหว่าง tick ก่อนหน้าในเฟรมเดียวกัน
+        profiler = self.profiler
+        self._previous = self._positions()
+        inputs = self.input.poll()  # อินพุตที่เข้ามาระหว่างเฟรมถูกใช้ตั้งแต่ต้น tick นี้
+        # ตัดปุ่มของผู้เล่นที่ไม่มีในโหมดนี้ทิ้ง (เช่นกดปุ่มผู้เล่น 3 ในเกม 1 ต่อ 1) replay เก็บแค่บิตของผู้เล่นที่มีอยู่
+        inputs &= (1 << INPUT_BITS * len(self.match.paddles)) - 1
+        profiler.lap('input')
+        if self.session:
+            events = self.session.advance(inputs)
+            profiler.lap('physics')
+        else:
+            if self.cpu:
+                inputs = (inputs & PLAYER1_INPUTS) | self.cpu.inputs(self.match)
+                profiler.lap('ai')
+            events = step(self.match, inputs)
+            profiler.lap('physics')
+            self.recorder.record(inputs, events)
+            if self.cpu:
+                self.cpu.notify(events)
+
+        particles = self.particles
+        r = BALL_SIZE / 2
+        for kind, x, y in events:
+            if kind in (HIT_WALL, HIT_PADDLE, HIT_NET):
+                self.mixer.trigger('ball_hit')
+                particles.sparks(x + r, y + r)
+                self._trail_ticks = TRAIL_TICKS
+            elif kind == POINT:
+                particles.dust(x + r, y)  # ลูกบอลตกพื้น
+            elif kind == SERVE:
+                self._previous = self._positions()  # ลูกบอลย้ายไปที่ผู้เสิร์ฟ ไม่ต้อง interpolate
+                self._log_serve()
+        if events:
+            # แมตช์เน็ตเวิร์กจบเมื่ออินพุตยืนยันครบแล้วเท่านั้น (ดู update)
+            self.flow.on_events(events, finish=not self.session)
+        if self._trail_ticks and particles.budget:
+            self._trail_ticks -= 1
+            for ball in self.match.balls:
+                particles.trail(ball.x + r, ball.y + r)
+        profiler.lap('events')
+
+    def _on_flip(self, window):
+        # ช่วงตั้งแต่จบ update จนถึงตอนนี้คือเวลาที่ Kivy ใช้วาดจอ
+        self.profiler.lap('draw')
+
+    def _on_state(self, old, new):
+        # ลูปเกม 60 Hz ทำงานเฉพาะตอนกำลังเล่น ที่เหลือ Kivy วาดจอใหม่เฉพาะเมื่อมีอะไรเปลี่ยน
+        if new in ACTIVE and old not in ACTIVE:
+            self.timestep.reset()
+            self.input.clear()
+            set_clock_rate(self.active_fps)
+            Clock.schedule_interval(self.update, 0)
+        elif new not in ACTIVE and old in ACTIVE:
+            Clock.unschedule(self.update)
+            self.profiler.pause()
+            set_clock_rate(IDLE_FPS)
+        if old == PAUSED:
+            self.win_label.text = ""
+            self.back_to_menu_button.opacity = 0
+        if new == SERVING:
+            self._update_hud()  # เริ่มแมตช์หรือเพิ่งได้คะแนน
+        elif new == PAUSED:
+            self.win_label.text = "Paused (P to resume)"
+            self.back_to_menu_button.opacity = 1
+        elif new == GAME_OVER:
+            self._update_hud()
+            self._finish_match()
+
+    def _on_minimize(self, window):
+        if not self.session:
+            self.flow.pause()
+
+    def _on_debug_key(self, window, key, *args):
+        if key == PAUSE_KEY:
+            if not self.session:  # อีกฝั่งไม่หยุดตาม
+                self.flow.toggle_pause()
+        elif key == PROFILER_KEY:
+            if self.profiler.toggle():
+                self.profiler_overlay.show()
             else:
-                self.ball.velocity.x = abs(self.ball.velocity.x)  # ทำให้ลูกบอลกระเด็นไปทางขวา
-                self.ball.x = self.player2.right  # ปรับตำแหน่งลูกบอลไปทางขวาของผู้เล่น
-            self.ball.velocity.y = abs(self.ball.velocity.y)  # ทำให้ลูกบอลกระเด็นขึ้น
-            App.get_running_app().ball_hit_sound.play()
-
-        # การชนของลูกบอลกับตาข่าย
-        if self.ball.collide_widget(self.net):
-            self.ball.velocity.x *= -1  # กลับทิศทางของความเร็วในแนว x ของลูกบอล
-            App.get_running_app().ball_hit_sound.play()
-        self.score_label.text = f"Player 1: {self.player1_score} | Player 2: {self.player2_score}"
-
-        # ทำให้ผู้เล่นผ่านตาข่ายไม่ได้
-        if self.player1.collide_widget(self.net):
-            self.player1.x = self.net.x - self.player1.width
-        if self.player2.collide_widget(self.net):
-            self.player2.x = self.net.right
-
-        # อัปเดตการเคลื่อนไหวของผู้เล่นตามปุ่มที่กด
-        if 'w' in self.keys_pressed:
-            self.player1.jump()
-        if 'a' in self.keys_pressed:
-            self.player1.move_left()
-        if 'd' in self.keys_pressed:
-            self.player1.move_right()
-        if 'up' in self.keys_pressed:
-            self.player2.jump()
-        if 'left' in self.keys_pressed:
-            self.player2.move_left()
-        if 'right' in self.keys_pressed:
-            self.player2.move_right()
-
-    def on_key_down(self, window, key, *args):
-        if key == 119:  # ปุ่ม W
-            self.keys_pressed.add('w')
-        elif key == 97:  # ปุ่ม A
-            self.keys_pressed.add('a')
-        elif key == 100:  # ปุ่ม D
-            self.keys_pressed.add('d')
-        elif key == 273:  # ปุ่มลูกศรขึ้น
-            self.keys_pressed.add('up')
-        elif key == 276:  # ปุ่มลูกศรซ้าย
-            self.keys_pressed.add('left')
-        elif key == 275:  # ปุ่มลูกศรขวา
-            self.keys_pressed.add('right')
-
-    def on_key_up(self, window, key, *args):
-        if key == 119:  # ปุ่ม W
-            self.keys_pressed.discard('w')
-        elif key == 97:  # ปุ่ม A
-            self.keys_pressed.discard('a')
-        elif key == 100:  # ปุ่ม D
-            self.keys_pressed.discard('d')
-        elif key == 273:  # ปุ่มลูกศรขึ้น
-            self.keys_pressed.discard('up')
-        elif key == 276:  # ปุ่มลูกศรซ้าย
-            self.keys_pressed.discard('left')
-        elif key == 275:  # ปุ่มลูกศรขวา
-            self.keys_pressed.discard('right')
+                self.profiler_overlay.hide()
+        elif key == EXPORT_PROFILE_KEY:
+            self.export_profile()
+        elif key == FULLSCREEN_KEY:
+            Window.fullscreen = False if Window.fullscreen else 'auto'
+
+    def export_profile(self):
+        if not self.profiler.frames:
+            print("No profile to export, press F3 to start recording")
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, time.strftime('%Y%m%d-%H%M%S'))
+        self.profiler.export_chrome_trace(path + '.json')
+        self.profiler.export_csv(path + '.csv')
+        print(f"Profile saved to {path}.json and {path}.csv")
+
+    def _finish_match(self):
+        mean, p95, worst = self.input.latency_stats()
+        print(f"Input latency: mean {mean:.1f} ms, p95 {p95:.1f} ms, max {worst:.1f} ms")
+        if self.session:
+            # ชนะใน tick ที่ยังเดาอินพุตอยู่อาจถูก rollback ได้ จึงจบเกมเมื่ออินพุตยืนยันครบแล้วเท่านั้น
+            self._update_net_stats()
+            Clock.unschedule(self._update_net_stats)
+            Clock.schedule_interval(self._flush_session, FLUSH_INTERVAL)
+        self._save_replay()
+
+    def _flush_session(self, dt):
+        # update หยุดแล้ว แต่อีกฝั่งอาจยังไม่ได้อินพุตชุดสุดท้ายของเรา ส่งซ้ำจนกว่าจะได้ ack
+        if self.session.flush():
+            Clock.unschedule(self._flush_session)
+
+    def start_netplay(self, session):
+        self.session = session
+        self.cpu = None
+        self._use_match(session.match)
+        self.start_match()
+        Clock.schedule_interval(self._update_net_stats, 0.25)
+
+    def _update_net_stats(self, *args):
+        session = self.session
+        if not session.connected:
+            self.net_label.text = "Waiting for peer..."
+            return
+        self.net_label.text = (f"RTT {session.rtt * 1000:.0f} ms\n"
+                               f"Rollback {session.rollback_depth} (max {session.max_rollback_depth}) ticks\n"
+                               f"Resimulated {self._resim_peak} ticks/frame, stalls {session.stalls}")
+        self._resim_peak = 0
 
     def replay_game(self, instance):
+        if self.session:
+            return
         self.reset_game()
-        self.serve_ball(velocity=(6, 6))
-        Clock.schedule_interval(self.update, 1.0 / 60.0)  # เริ่มเกมใหม่
+        self.serve_ball()
+        self.start_match()  # เริ่มเกมใหม่
 
     def back_to_main_menu(self, instance):
+        self._save_replay()  # เก็บแมตช์ที่เล่นไม่จบไว้ด้วย เผื่อใช้แจ้งบั๊ก
+        self.flow.quit()
+        if self.session:
+            Clock.unschedule(self._update_net_stats)
+            Clock.unschedule(self._flush_session)
+            self.session.transport.close()
+            self.session = None
+            self.net_label.text = ""
+            self._use_match(MatchState())
         self.reset_game()
         App.get_running_app().show_start_screen()
 
+    def _save_replay(self):
+        if self.recorder is None or not self.recorder.replay.ticks:
+            return
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        path = os.path.join(REPLAY_DIR, time.strftime('%Y%m%d-%H%M%S') + '.vbr')
+        self.recorder.finish().save(path)
+        self.recorder = None
+        print(f"Replay saved to {path}")
+
+    def start_match(self):
+        # ฟิสิกส์เดินด้วย tick คงที่ ส่วน update ถูกเรียกทุกเฟรมตามอัตรารีเฟรชของจอ (ตั้งใน _on_state)
+        self.recorder = None if self.session else ReplayRecorder(self.match)
+        self.flow.start()
+
     def reset_game(self):
-        self.player1_score = 0
-        self.player2_score = 0
-        self.win_label.text = ""
-        self.replay_button.opacity = 0  # ซ่อนปุ่ม replay
-        self.back_to_menu_button.opacity = 0  # ซ่อนปุ่ม back to menu
-        self.ball.center = self.center
-        self.ball.velocity = Vector(6, 6)
+        reset_match(self.match)
+        self.particles.clear()
+        self._trail_ticks = 0
+        if self.cpu:
+            self.cpu.reset()
+        self._previous = self._positions()
+        self._sync_widgets()
+        self._update_hud()
 
 class VolleyballApp(App):
+    def __init__(self, netplay=None, **kwargs):
+        super().__init__(**kwargs)
+        self.started_at = time.perf_counter()
+        self.netplay = netplay  # อาร์กิวเมนต์ของโหมดเน็ตเวิร์ก หรือ None
+
     def build(self):
+        self.assets = AssetCache()
+        self.sound = None  # เพลงพื้นหลังโหลดใน thread แยก จะมีค่าเมื่อโหลดเสร็จ
+        self.music_volume = 1.0
         self.root = FloatLayout()
-        self.bg_image = Image(source='assets/bg.png', allow_stretch=True, keep_ratio=False)
-        self.root.add_widget(self.bg_image)
-        self.game = VolleyballGame(size=self.root.size)
-        self.sound = SoundLoader.load('assets/Aioli - Andrew Langdon.mp3')
-        self.ball_hit_sound = SoundLoader.load('assets/ball_hitted.mp3')
-        self.ball_hit_sound.volume = 0.5  # ระดับเสียงเริ่มต้น
-        self.show_start_screen()
+        # หน้า loading เบา ๆ ให้เห็นก่อนระหว่างโหลดไฟล์
+        self.root.add_widget(Label(text="Loading..."))
+        Clock.schedule_once(self._on_first_frame, 0)  # timeout 0 = หลังวาดเฟรมแรกเสร็จ
         return self.root
 
+    def _on_first_frame(self, dt):
+        self.first_frame_time = time.perf_counter() - self.started_at
+        self.assets.preload_sound(MUSIC, self._on_music_loaded)
+        for path in (BG_IMAGE, MENU_BG_IMAGE, PLAYER1_IMAGE, PLAYER2_IMAGE):
+            self.assets.texture(path)
+        self.profiler = FrameProfiler()
+        self.mixer = SoundMixer(profiler=self.profiler)
+        self.mixer.add_effect('ball_hit', self.assets.sound_voices(BALL_HIT_SOUND, 4),
+                              volume=0.5)  # ระดับเสียงเริ่มต้น
+        self.particles = ParticlePool()
+        self.game = VolleyballGame(self.assets, self.mixer, self.profiler, self.particles, size=self.root.size)
+        self.screens = ScreenGraph(self.root)
+        self.screens.add('start', self._build_start_screen, lazy=False)
+        self.screens.add('mode_selection', self._build_mode_selection)
+        self.screens.add('difficulty_selection', self._build_difficulty_selection)
+        self.screens.add('settings', self._build_settings)
+        self.screens.add('game', lambda: self.game, lazy=False)
+        if self.netplay:
+            self.start_netplay()
+        else:
+            self.show_start_screen()
+        print(f"First frame after {self.first_frame_time * 1000:.1f} ms, "
+              f"menu ready after {(time.perf_counter() - self.started_at) * 1000:.1f} ms")
+
+    def _on_music_loaded(self, sound):
+        self.sound = sound
+        print(f"Music loaded after {(time.perf_counter() - self.started_at) * 1000:.1f} ms")
+        print("Asset load times:\n" + self.assets.report())
+        if sound:
+            sound.volume = self.music_volume
+            if self.screens.current != 'game':  # ยังอยู่ในเมนู
+                sound.loop = True
+                sound.play()
+
+    def _menu_background(self):
+        return Image(texture=self.assets.texture(MENU_BG_IMAGE), allow_stretch=True, keep_ratio=False)
+
     def show_start_screen(self, *args):
-        if self.sound:
+        if self.sound and self.sound.state != 'play':  # ไม่เริ่มเพลงใหม่ถ้ายังเล่นอยู่
             self.sound.loop = True
             self.sound.play()
+        self.screens.show('start')
 
+    def _build_start_screen(self):
         start_layout = FloatLayout()
-        self.menu_bg_image = Image(source='assets/sky.png', allow_stretch=True, keep_ratio=False)
+        self.menu_bg_image = self._menu_background()
         start_layout.add_widget(self.menu_bg_image)
         
         box_layout = BoxLayout(orientation='vertical', spacing=10, padding=50)
@@ -376,9 +542,7 @@ class VolleyballApp(App):
         box_layout.add_widget(self.quit_button)
 
         start_layout.add_widget(box_layout)
-
-        self.root.clear_widgets()
-        self.root.add_widget(start_layout)
+        return start_layout
 
     def _update_bg(self, *args):
         self.bg.size = self.root.size
@@ -389,8 +553,11 @@ class VolleyballApp(App):
         self.menu_bg_image.pos = self.root.pos
 
     def show_mode_selection(self, instance):
+        self.screens.show('mode_selection')
+
+    def _build_mode_selection(self):
         mode_layout = FloatLayout()
-        self.menu_bg_image = Image(source='assets/sky.png', allow_stretch=True, keep_ratio=False)
+        self.menu_bg_image = self._menu_background()
         mode_layout.add_widget(self.menu_bg_image)
         
         box_layout = BoxLayout(orientation='vertical', spacing=10, padding=50)
@@ -400,7 +567,7 @@ class VolleyballApp(App):
             size_hint=(None, None),
             size=(200, 100),
             pos_hint={'center_x': 0.5, 'center_y': 0.5},
-            on_press=self.show_ai_message
+            on_press=self.show_difficulty_selection
         )
         box_layout.add_widget(self.player_vs_cpu_button)
 
@@ -413,38 +580,71 @@ class VolleyballApp(App):
         )
         box_layout.add_widget(self.player_vs_player_button)
 
+        self.doubles_button = Button(
+            text="2 vs 2",
+            size_hint=(None, None),
+            size=(200, 100),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5},
+            on_press=lambda x: self.start_game(x, mode='doubles')
+        )
+        box_layout.add_widget(self.doubles_button)
+
+        self.party_button = Button(
+            text="Party (8 balls)",
+            size_hint=(None, None),
+            size=(200, 100),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5},
+            on_press=lambda x: self.start_game(x, mode='party')
+        )
+        box_layout.add_widget(self.party_button)
+
         mode_layout.add_widget(box_layout)
+        return mode_layout
 
-        self.root.clear_widgets()
-        self.root.add_widget(mode_layout)
+    def show_difficulty_selection(self, instance):
+        self.screens.show('difficulty_selection')
 
-    def show_ai_message(self, instance):
-        self.root.clear_widgets()
-        message_layout = BoxLayout(orientation='vertical', spacing=10, padding=50)
-        
-        self.message_label = Label(
-            text="Sorry, I haven't done AI yet",
+    def _build_difficulty_selection(self):
+        difficulty_layout = FloatLayout()
+        difficulty_layout.add_widget(self._menu_background())
+
+        box_layout = BoxLayout(orientation='vertical', spacing=10, padding=50)
+
+        self.difficulty_label = Label(
+            text="CPU Difficulty",
             size_hint=(None, None),
-            size=(200, 100),
+            size=(200, 50),
             pos_hint={'center_x': 0.5, 'center_y': 0.5}
         )
-        message_layout.add_widget(self.message_label)
-
-        self.back_button = Button(
+        box_layout.add_widget(self.difficulty_label)
+
+        for difficulty in DIFFICULTIES:
+            box_layout.add_widget(Button(
+                text=difficulty.capitalize(),
+                size_hint=(None, None),
+                size=(200, 80),
+                pos_hint={'center_x': 0.5, 'center_y': 0.5},
+                on_press=lambda x, difficulty=difficulty: self.start_game(x, difficulty=difficulty)
+            ))
+
+        self.difficulty_back_button = Button(
             text="Back",
             size_hint=(None, None),
-            size=(200, 100),
+            size=(200, 80),
             pos_hint={'center_x': 0.5, 'center_y': 0.5},
-            on_press=lambda x: self.show_start_screen()
+            on_press=self.show_mode_selection
         )
-        message_layout.add_widget(self.back_button)
+        box_layout.add_widget(self.difficulty_back_button)
 
-        self.root.add_widget(message_layout)
+        difficulty_layout.add_widget(box_layout)
+        return difficulty_layout
 
     def show_settings(self, instance):
-        self.root.clear_widgets()
+        self.screens.show('settings')
+
+    def _build_settings(self):
         settings_layout = FloatLayout()
-        self.settings_bg_image = Image(source='assets/sky.png', allow_stretch=True, keep_ratio=False)
+        self.settings_bg_image = self._menu_background()
         settings_layout.add_widget(self.settings_bg_image)
         
         box_layout = BoxLayout(orientation='vertical', spacing=10, padding=50)
@@ -460,7 +660,7 @@ class VolleyballApp(App):
         self.volume_slider = Slider(
             min=0,
             max=1,
-            value=self.sound.volume if self.sound else 0.5,
+            value=self.music_volume,
             size_hint=(None, None),
             size=(200, 50),
             pos_hint={'center_x': 0.5, 'center_y': 0.5}
@@ -479,7 +679,7 @@ class VolleyballApp(App):
         self.ball_hit_volume_slider = Slider(
             min=0,
             max=1,
-            value=self.ball_hit_sound.volume if self.ball_hit_sound else 0.5,
+            value=self.mixer.volumes['ball_hit'],
             size_hint=(None, None),
             size=(200, 50),
             pos_hint={'center_x': 0.5, 'center_y': 0.5}
@@ -487,6 +687,27 @@ class VolleyballApp(App):
         self.ball_hit_volume_slider.bind(value=self.on_ball_hit_volume_change)
         box_layout.add_widget(self.ball_hit_volume_slider)
 
+        self.effects_label = Label(
+            text="Hit Effects",
+            size_hint=(None, None),
+            size=(200, 50),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5}
+        )
+        box_layout.add_widget(self.effects_label)
+
+        # เครื่องช้าลดจำนวนอนุภาคได้ ซ้ายสุดคือปิดเอฟเฟกต์
+        self.effects_slider = Slider(
+            min=0,
+            max=self.particles.capacity,
+            step=1,
+            value=self.particles.budget,
+            size_hint=(None, None),
+            size=(200, 50),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5}
+        )
+        self.effects_slider.bind(value=self.on_effects_change)
+        box_layout.add_widget(self.effects_slider)
+
         self.back_button = Button(
             text="Back",
             size_hint=(None, None),
@@ -497,27 +718,42 @@ class VolleyballApp(App):
         box_layout.add_widget(self.back_button)
 
         settings_layout.add_widget(box_layout)
-        self.root.add_widget(settings_layout)
+        return settings_layout
 
     def on_volume_change(self, instance, value):
+        self.music_volume = value
         if self.sound:
             self.sound.volume = value
 
     def on_ball_hit_volume_change(self, instance, value):
-        if self.ball_hit_sound:
-            self.ball_hit_sound.volume = value
+        self.mixer.set_volume('ball_hit', value)
 
-    def start_game(self, instance):
+    def on_effects_change(self, instance, value):
+        self.particles.set_budget(value)
+
+    def start_game(self, instance, difficulty=None, mode='classic'):
         if self.sound:
             self.sound.stop()
+        self.game.set_mode(mode)
+        self.game.set_cpu(difficulty)
         self.game.serve_ball()
-        Clock.unschedule(self.game.update)
-        Clock.schedule_interval(self.game.update, 1.0 / 60.0)
-        self.root.clear_widgets()
-        self.root.add_widget(self.game)
+        self.game.start_match()
+        self.screens.show('game')
+
+    def start_netplay(self):
+        args = self.netplay
+        transport = UdpTransport(args.port, args.peer, args.delay_ms, args.loss)
+        self.game.start_netplay(RollbackSession(args.side, transport, args.input_delay))
+        self.screens.show('game')
+        print(f"Netplay as player {args.side} on port {args.port}, peer {args.peer[0]}:{args.peer[1]}")
 
     def quit_game(self, instance):
         App.get_running_app().stop()
 
 if __name__ == "__main__":
-    VolleyballApp().run()
\ No newline at end of file
+    # อาร์กิวเมนต์ของเกมอยู่หลัง -- เช่น python main.py -- --netplay --port 7000 --peer 127.0.0.1:7001
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--netplay', action='store_true', help="เล่นสองคนผ่านเน็ตเวิร์ก")
+    add_arguments(parser)
+    args = parser.parse_args()
+    VolleyballApp(netplay=args if args.netplay else None).run()
\ No newline at end of file
@@ -0,0 +1,309 @@
+import argparse
+import heapq
+import random
+import socket
+import struct
+import threading
+import time
+
+from simulation import (
+    COURT_HEIGHT, COURT_WIDTH, PLAYER1_INPUTS, PLAYER2_INPUTS, MatchState, restore, serve, snapshot, step,
+)
+
+MAGIC = b'VBN2'
+# magic, tick แรกของอินพุตในแพ็กเก็ต, tick ล่าสุดที่ได้รับจากอีกฝั่งครบแล้ว (ack),
+# จำนวนอินพุต, เวลาส่ง, เวลาส่งล่าสุดของอีกฝั่งที่สะท้อนกลับ และเวลาที่เก็บมันไว้ก่อนส่งกลับ (ใช้วัด RTT)
+PACKET = struct.Struct('<4sIIBddd')
+MAX_INPUTS_PER_PACKET = 64
+INPUT_DELAY = 2  # หน่วงอินพุตของตัวเอง 2 tick เพื่อลดจำนวนครั้งที่ต้อง rollback
+MAX_ROLLBACK = 12  # ถ้าอีกฝั่งตามหลังเกินนี้ให้รอ แทนที่จะย้อนไกลเกินไป
+COURT_SIZE = (COURT_WIDTH, COURT_HEIGHT)  # ทั้งสองเครื่องต้องจำลองสนามขนาดเดียวกัน
+FLUSH_INTERVAL = 0.1  # วินาทีระหว่างการส่งซ้ำหลังจบแมตช์
+RECEIVE_TIMEOUT = 0.1  # thread รับแพ็กเก็ตตื่นมาเช็กว่าปิด transport แล้วหรือยังทุกเท่านี้วินาที
+FLUSH_TIMEOUT = 5.0  # ส่งซ้ำหลังจบแมตช์นานสุดกี่วินาที (อีกฝั่งอาจปิดไปแล้วจึงไม่มี ack กลับมา)
+
+
+class UdpTransport:
+    # ส่งและรับแพ็กเก็ต UDP จำลองความหน่วงและการสูญหายได้สำหรับทดสอบ
+    # thread แยกคอยรับแพ็กเก็ตและจดเวลาที่มาถึงจริง เกมอ่านแค่ tick ละครั้ง เวลาที่แพ็กเก็ตรออยู่จึงไม่ถูกนับเป็น RTT
+    # ความหน่วงจำลองที่ฝั่งรับ (เวลามาถึง + delay) จึงตรงตามที่ตั้งไม่ว่าแต่ละฝั่งจะเรียก receive ถี่แค่ไหน
+
+    def __init__(self, port, peer, delay_ms=0, loss=0.0, seed=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('0.0.0.0', port))
+        self.sock.settimeout(RECEIVE_TIMEOUT)
+        self.peer = peer
+        self.delay = delay_ms / 1000
+        self.loss = loss
+        self.random = random.Random(seed)
+        self._queue = []  # (เวลาที่มาถึง + delay, ลำดับ, ข้อมูล)
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._receive_worker, daemon=True)
+        self._thread.start()
+
+    def send(self, data):
+        if self.loss and self.random.random() < self.loss:
+            return
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError:
+            pass  # อีกฝั่งยังไม่เปิด ส่งใหม่รอบหน้า
+
+    def _receive_worker(self):
+        while not self._closed:
+            try:
+                data, _ = self.sock.recvfrom(2048)
+            except (socket.timeout, ConnectionResetError):
+                continue
+            except OSError:
+                return
+            arrival = time.perf_counter() + self.delay
+            with self._lock:
+                self._sequence += 1
+                heapq.heappush(self._queue, (arrival, self._sequence, data))
+
+    def receive(self):
+        # คืน [(ข้อมูล, เวลาที่มาถึงตาม time.perf_counter)] ของแพ็กเก็ตที่ถึงเวลาแล้ว
+        now = time.perf_counter()
+        packets = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                arrival, _, data = heapq.heappop(self._queue)
+                packets.append((data, arrival))
+        return packets
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
+        self.sock.close()
+
+
+class RollbackSession:
+    # แต่ละเครื่องจำลองเกมเองทั้งหมด อินพุตของอีกฝั่งที่ยังมาไม่ถึงจะเดาว่าเหมือนครั้งล่าสุด
+    # พอได้อินพุตจริงแล้วไม่ตรงกับที่เดา ให้ย้อนไป snapshot ของ tick นั้นแล้วจำลองใหม่ถึงปัจจุบัน
+
+    def __init__(self, side, transport, input_delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK, match=None):
+        self.side = side
+        self.transport = transport
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        if match is None:
+            match = MatchState(*COURT_SIZE)
+            serve(match)
+        self.match = match
+        self.local_inputs = {}
+        self.remote_inputs = {}
+        self.predicted = {}  # tick -> อินพุตของอีกฝั่งที่เดาไว้ตอนจำลอง tick นั้น
+        self.states = {}  # tick -> snapshot ของสถานะหลังจบ tick นั้น
+        self.confirmed_tick = 0  # ได้อินพุตของอีกฝั่งครบถึง tick นี้แล้ว
+        self.remote_ack = 0  # อีกฝั่งได้อินพุตของเราครบถึง tick นี้แล้ว
+        self.connected = False
+        self._rollback_from = None
+        self._remote_ping = 0.0
+        self._remote_ping_at = 0.0  # เวลาของเครื่องนี้ที่ _remote_ping มาถึง
+        self._flush_deadline = None
+        # สถิติสำหรับแสดงบนจอ
+        self.rtt = 0.0
+        self.rollbacks = 0
+        self.rollback_depth = 0
+        self.max_rollback_depth = 0
+        self.resimulated = 0
+        self.frame_resimulated = 0
+        self.stalls = 0
+
+    def _local_bits(self, raw):
+        # ผู้เล่นแต่ละเครื่องใช้ปุ่มชุดไหนก็ได้ (WASD หรือลูกศร) ควบคุมฝั่งของตัวเอง
+        if self.side == 1:
+            return (raw & PLAYER1_INPUTS) | ((raw & PLAYER2_INPUTS) >> 3)
+        return ((raw & PLAYER1_INPUTS) << 3) | (raw & PLAYER2_INPUTS)
+
+    @property
+    def finished(self):
+        # ผลแพ้ชนะนับเมื่ออินพุตทุก tick ถึงตอนจบได้รับการยืนยันแล้วเท่านั้น
+        return bool(self.match.winner) and self.confirmed_tick >= self.match.tick
+
+    @property
+    def delivered(self):
+        # อีกฝั่งได้อินพุตของเราครบถึง tick ล่าสุดแล้ว
+        return self.remote_ack >= self.match.tick
+
+    def flush(self):
+        # เรียกเป็นระยะ (ทุก FLUSH_INTERVAL) แทน advance หลังแมตช์จบ (finished)
+        # ถ้าแพ็กเก็ตสุดท้ายของเราหาย อีกฝั่งจะยังรออินพุตอยู่และจบแมตช์ไม่ได้ จึงต้องส่งซ้ำจนกว่าจะได้ ack
+        # คืน True เมื่อหยุดส่งได้แล้ว (อีกฝั่งได้ครบ หรือรอเกิน FLUSH_TIMEOUT)
+        if self._flush_deadline is None:
+            self._flush_deadline = time.perf_counter() + FLUSH_TIMEOUT
+        self._receive()
+        self._send()
+        return self.delivered or time.perf_counter() > self._flush_deadline
+
+    def advance(self, raw_inputs):
+        # เรียกหนึ่งครั้งต่อ tick คืนเหตุการณ์ของ tick ใหม่ (ไม่รวมที่เกิดจากการจำลองซ้ำ)
+        self._receive()
+        events = []
+        if not self.connected:
+            self._send()
+            return events
+        if self._rollback_from is not None:
+            self._rollback(self._rollback_from)
+            self._rollback_from = None
+        if self.match.tick + 1 - self.confirmed_tick > self.max_rollback:
+            self.stalls += 1  # อีกฝั่งตามหลังมากเกินไป รออินพุตก่อน
+        else:
+            self.local_inputs[self.match.tick + 1 + self.input_delay] = self._local_bits(raw_inputs)
+            events = self._simulate(self.match.tick + 1)
+        self._send()
+        return events
+
+    def take_frame_stats(self):
+        resimulated = self.frame_resimulated
+        self.frame_resimulated = 0
+        return resimulated
+
+    def _simulate(self, tick):
+        remote = self.remote_inputs.get(tick)
+        if remote is None:
+            remote = self.remote_inputs.get(self.confirmed_tick, 0)
+            self.predicted[tick] = remote
+        else:
+            self.predicted.pop(tick, None)
+        self.states[tick - 1] = snapshot(self.match)
+        return step(self.match, self.local_inputs.get(tick, 0) | remote)
+
+    def _rollback(self, tick):
+        end = self.match.tick
+        if tick > end:
+            return
+        restore(self.match, self.states[tick - 1])
+        depth = end - tick + 1
+        for resim_tick in range(tick, end + 1):
+            self._simulate(resim_tick)
+            if self.match.winner:
+                break
+        self.rollbacks += 1
+        self.rollback_depth = depth
+        self.max_rollback_depth = max(self.max_rollback_depth, depth)
+        self.resimulated += depth
+        self.frame_resimulated += depth
+
+    def _receive(self):
+        for data, arrival in self.transport.receive():
+            if len(data) < PACKET.size:
+                continue
+            magic, first, ack, count, ping, echo, hold = PACKET.unpack_from(data)
+            if magic != MAGIC:
+                continue
+            self.connected = True
+            self.remote_ack = max(self.remote_ack, ack)
+            if ping > self._remote_ping:
+                self._remote_ping = ping
+                self._remote_ping_at = arrival
+            if echo:
+                # เวลาที่อีกฝั่งถือ ping ของเราไว้ (ตั้งแต่มาถึงจนถึง tick ที่ส่งกลับ) ไม่ใช่เวลาบนเน็ตเวิร์ก
+                sample = arrival - echo - hold
+                self.rtt = sample if not self.rtt else self.rtt * 0.9 + sample * 0.1
+            payload = data[PACKET.size:PACKET.size + count]
+            for offset, bits in enumerate(payload):
+                tick = first + offset
+                if tick in self.remote_inputs:
+                    continue
+                self.remote_inputs[tick] = bits
+                predicted = self.predicted.pop(tick, None)
+                if predicted is not None and predicted != bits:
+                    if self._rollback_from is None or tick < self._rollback_from:
+                        self._rollback_from = tick
+            while self.confirmed_tick + 1 in self.remote_inputs:
+                self.confirmed_tick += 1
+        self._prune()
+
+    def _send(self):
+        first = self.remote_ack + 1
+        last = max(self.local_inputs, default=0)
+        count = max(0, min(last - first + 1, MAX_INPUTS_PER_PACKET))
+        payload = bytes(self.local_inputs.get(tick, 0) for tick in range(first, first + count))
+        now = time.perf_counter()
+        hold = now - self._remote_ping_at if self._remote_ping else 0.0
+        header = PACKET.pack(MAGIC, first, self.confirmed_tick, count, now, self._remote_ping, hold)
+        self.transport.send(header + payload)
+
+    def _prune(self):
+        # ลบข้อมูลที่ไม่มีทางต้องย้อนกลับไปใช้อีก
+        oldest = min(self.confirmed_tick, self.remote_ack) - 1
+        for table in (self.local_inputs, self.remote_inputs, self.states):
+            if len(table) > 4 * (self.max_rollback + self.input_delay + MAX_INPUTS_PER_PACKET):
+                for tick in [tick for tick in table if tick < oldest]:
+                    del table[tick]
+
+
+def parse_peer(text):
+    host, port = text.rsplit(':', 1)
+    return host, int(port)
+
+
+def add_arguments(parser):
+    parser.add_argument('--port', type=int, default=7000, help="พอร์ต UDP ของเครื่องนี้")
+    parser.add_argument('--peer', type=parse_peer, default=('127.0.0.1', 7001), help="host:port ของอีกฝั่ง")
+    parser.add_argument('--side', type=int, choices=(1, 2), default=1, help="ควบคุมผู้เล่นฝั่งไหน")
+    parser.add_argument('--delay-ms', type=float, default=0, help="จำลองความหน่วงขาส่ง (ms)")
+    parser.add_argument('--loss', type=float, default=0.0, help="จำลองแพ็กเก็ตหาย (0..1)")
+    parser.add_argument('--input-delay', type=int, default=INPUT_DELAY)
+
+
+def self_test(args):
+    # จำลองสองเครื่องในโปรเซสเดียวผ่าน loopback ด้วยอินพุตสุ่มจนแมตช์จบ แล้วตรวจว่าผลลัพธ์ตรงกัน
+    # แต่ละฝั่งหยุดแบบเดียวกับ main.py: เดินจนกว่า finished แล้วเรียกแค่ flush ทุก FLUSH_INTERVAL จนมันคืน True
+    rng = random.Random(1)
+    sessions = []
+    for side, port, peer_port in ((1, args.port, args.port + 1), (2, args.port + 1, args.port)):
+        transport = UdpTransport(port, ('127.0.0.1', peer_port), args.delay_ms, args.loss, side)
+        match = MatchState(*COURT_SIZE, win_score=args.win_score)
+        serve(match)
+        sessions.append(RollbackSession(side, transport, args.input_delay, match=match))
+    held = [0, 0]
+    stopped = [False, False]
+    next_flush = [0.0, 0.0]
+    tick = 1 / 60
+    next_tick = time.perf_counter()
+    for frame in range(args.ticks):
+        now = time.perf_counter()
+        for index, session in enumerate(sessions):
+            if rng.random() < 0.1:
+                held[index] = rng.getrandbits(3)
+            if not session.finished:
+                session.advance(held[index])
+            elif now >= next_flush[index]:
+                stopped[index] = stopped[index] or session.flush()
+                next_flush[index] = now + FLUSH_INTERVAL
+        if all(stopped):
+            break
+        next_tick += tick
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    for session in sessions:
+        print(f"side {session.side}: tick {session.match.tick}, score {session.match.player1_score}-"
+              f"{session.match.player2_score}, finished {session.finished}, delivered {session.delivered}, "
+              f"rtt {session.rtt * 1000:.1f} ms, rollbacks {session.rollbacks}, "
+              f"max depth {session.max_rollback_depth}, resimulated {session.resimulated}, stalls {session.stalls}")
+    states = [snapshot(session.match) for session in sessions]
+    ok = all(session.finished for session in sessions) and states[0] == states[1]
+    if not all(session.finished for session in sessions):
+        print(f"match not finished after {args.ticks} ticks")
+    print("peers in sync" if states[0] == states[1] else "peers DESYNCED")
+    for session in sessions:
+        session.transport.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ทดสอบ rollback netcode สองเครื่องใน loopback")
+    add_arguments(parser)
+    parser.add_argument('--ticks', type=int, default=60 * 60, help="จำนวน tick สูงสุดที่รอให้แมตช์จบ")
+    parser.add_argument('--win-score', type=int, default=2)
+    args = parser.parse_args()
+    raise SystemExit(0 if self_test(args) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import math
+import random
+from array import array
+
+MAX_PARTICLES = 512  # ขนาด pool จองครั้งเดียวตอนเริ่มเกม ปรับ budget ได้แต่ไม่เกินค่านี้
+FLOATS_PER_VERTEX = 4  # x, y, u, v ตามรูปแบบ vertex เริ่มต้นของ Kivy Mesh
+STRIDE = FLOATS_PER_VERTEX * 4  # หนึ่งอนุภาคคือสี่เหลี่ยมหนึ่งรูป (4 vertex)
+
+SPARK = 0
+DUST = 1
+TRAIL = 2
+# สีของแต่ละชนิด (r, g, b, a) เก็บเป็น texture เล็ก ๆ หนึ่งคอลัมน์ต่อชนิด
+# แถวล่างสุดโปร่งใส แถวบนสุดทึบ อนุภาคเลือกแถวตามอายุที่เหลือ จึงจางหายได้โดยไม่ต้องมี Color ต่ออนุภาค
+PALETTE = ((255, 230, 120, 255), (170, 160, 140, 200), (255, 255, 255, 140))
+FADE_STEPS = 16
+# ชนิด -> (อายุเป็นวินาที, ขนาดเริ่มต้น, แรงโน้มถ่วง px/s², แรงต้านต่อวินาที)
+KINDS = {
+    SPARK: (0.35, 6.0, -900.0, 1.5),
+    DUST: (0.6, 10.0, 40.0, 3.0),
+    TRAIL: (0.2, 18.0, 0.0, 0.0),
+}
+SPARK_COUNT = 12  # ต่อการชนหนึ่งครั้งเมื่อ budget เต็ม
+DUST_COUNT = 10
+
+
+def palette_pixels():
+    # พิกเซล rgba ของ texture สี (กว้าง = จำนวนชนิด, สูง = FADE_STEPS) แถวแรกคือแถวล่าง
+    pixels = bytearray()
+    for row in range(FADE_STEPS):
+        fade = row / (FADE_STEPS - 1)
+        for r, g, b, a in PALETTE:
+            pixels += bytes((r, g, b, int(a * fade)))
+    return bytes(pixels)
+
+
+class ParticlePool:
+    # เก็บอนุภาคทั้งหมดใน array แบบ float ที่จองไว้ล่วงหน้า อนุภาคที่ยังมีชีวิตอยู่ชิดหน้าเสมอ [0, active)
+    # ตัวที่ตายถูกแทนด้วยตัวสุดท้าย และ vertex ของช่องที่ว่างลงถูกยุบเป็นจุด (วาดแล้วไม่เห็น)
+    # ระหว่างเล่นจึงไม่มีการสร้าง list หรือ object ใหม่ และ Mesh อ่าน vertices ก้อนเดียวได้ตรง ๆ
+    # ใช้ random ของตัวเอง ไม่ไปแตะลำดับสุ่มของเกม เอฟเฟกต์จึงไม่มีผลกับการเล่น
+
+    def __init__(self, capacity=MAX_PARTICLES, budget=None, seed=None):
+        self.capacity = capacity
+        self.active = 0
+        self.dirty = False  # vertices เปลี่ยนตั้งแต่ส่งให้ Mesh ครั้งล่าสุด
+        zeros = bytes(4 * capacity)
+        self.x = array('f', zeros)
+        self.y = array('f', zeros)
+        self.vx = array('f', zeros)
+        self.vy = array('f', zeros)
+        self.life = array('f', zeros)  # 1 = เพิ่งเกิด, 0 = ตาย
+        self.decay = array('f', zeros)  # อายุที่ลดลงต่อวินาที
+        self.size = array('f', zeros)
+        self.gravity = array('f', zeros)
+        self.drag = array('f', zeros)
+        self.u = array('f', zeros)  # คอลัมน์สีของชนิดนั้นใน palette
+        self.vertices = array('f', bytes(4 * capacity * STRIDE))
+        self._blank = array('f', bytes(4 * STRIDE))
+        self.random = random.Random(seed)
+        self.set_budget(capacity if budget is None else budget)
+
+    def set_budget(self, budget):
+        # จำนวนอนุภาคที่มีพร้อมกันได้ 0 = ปิดเอฟเฟกต์ ตัวที่เกินอยู่ถูกทิ้งทันที
+        self.budget = max(0, min(int(budget), self.capacity))
+        while self.active > self.budget:
+            self._kill(self.active - 1)
+
+    def clear(self):
+        while self.active:
+            self._kill(self.active - 1)
+
+    def _count(self, count):
+        # budget ต่ำก็ยังเห็นทุกการชน แค่จำนวนอนุภาคน้อยลง
+        if not self.budget:
+            return 0
+        return max(1, count * self.budget // self.capacity)
+
+    def _emit(self, kind, x, y, vx, vy):
+        i = self.active
+        if i >= self.budget:
+            return
+        lifetime, size, gravity, drag = KINDS[kind]
+        self.active = i + 1
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.life[i] = 1.0
+        self.decay[i] = 1.0 / lifetime
+        self.size[i] = size
+        self.gravity[i] = gravity
+        self.drag[i] = drag
+        self.u[i] = (kind + 0.5) / len(PALETTE)
+        self.dirty = True
+
+    def sparks(self, x, y, count=SPARK_COUNT):
+        rng = self.random
+        for _ in range(self._count(count)):
+            angle = rng.uniform(0, 2 * math.pi)
+            speed = rng.uniform(150, 400)
+            self._emit(SPARK, x, y, math.cos(angle) * speed, math.sin(angle) * speed)
+
+    def dust(self, x, y, count=DUST_COUNT):
+        # ฝุ่นฟุ้งไปด้านข้างเลียดพื้นแล้วลอยขึ้นช้า ๆ
+        rng = self.random
+        for _ in range(self._count(count)):
+            self._emit(DUST, x + rng.uniform(-10, 10), y, rng.uniform(-120, 120), rng.uniform(10, 60))
+
+    def trail(self, x, y):
+        self._emit(TRAIL, x, y, 0.0, 0.0)
+
+    def _kill(self, i):
+        last = self.active - 1
+        if i != last:
+            # ย้ายตัวสุดท้ายมาแทน vertex ของมันจะถูกเขียนใหม่ตอน update ถัดไป
+            self.x[i] = self.x[last]
+            self.y[i] = self.y[last]
+            self.vx[i] = self.vx[last]
+            self.vy[i] = self.vy[last]
+            self.life[i] = self.life[last]
+            self.decay[i] = self.decay[last]
+            self.size[i] = self.size[last]
+            self.gravity[i] = self.gravity[last]
+            self.drag[i] = self.drag[last]
+            self.u[i] = self.u[last]
+        offset = last * STRIDE
+        self.vertices[offset:offset + STRIDE] = self._blank
+        self.active = last
+        self.dirty = True
+
+    def update(self, dt):
+        # เดินอนุภาคทั้งหมดไป dt วินาทีแล้วเขียนสี่เหลี่ยมของแต่ละตัวลง vertices
+        if not self.active:
+            return
+        xs, ys, vxs, vys = self.x, self.y, self.vx, self.vy
+        lives, decays, sizes, gravities, drags, us = (
+            self.life, self.decay, self.size, self.gravity, self.drag, self.u)
+        vertices = self.vertices
+        rows = FADE_STEPS - 1
+        i = 0
+        while i < self.active:
+            life = lives[i] - decays[i] * dt
+            if life <= 0:
+                self._kill(i)
+                continue
+            lives[i] = life
+            damping = 1.0 - drags[i] * dt
+            vx = vxs[i] * damping
+            vy = (vys[i] + gravities[i] * dt) * damping
+            x = xs[i] + vx * dt
+            y = ys[i] + vy * dt
+            vxs[i] = vx
+            vys[i] = vy
+            xs[i] = x
+            ys[i] = y
+            half = sizes[i] * (0.5 + 0.5 * life) / 2  # เล็กลงเมื่อใกล้หมดอายุ
+            u = us[i]
+            v = (0.5 + life * rows) / FADE_STEPS
+            o = i * STRIDE
+            vertices[o] = x - half
+            vertices[o + 1] = y - half
+            vertices[o + 2] = u
+            vertices[o + 3] = v
+            vertices[o + 4] = x + half
+            vertices[o + 5] = y - half
+            vertices[o + 6] = u
+            vertices[o + 7] = v
+            vertices[o + 8] = x + half
+            vertices[o + 9] = y + half
+            vertices[o + 10] = u
+            vertices[o + 11] = v
+            vertices[o + 12] = x - half
+            vertices[o + 13] = y + half
+            vertices[o + 14] = u
+            vertices[o + 15] = v
+            i += 1
+        self.dirty = True
@@ -0,0 +1,102 @@
+import csv
+import json
+import time
+from collections import deque
+
+# ช่วงเวลาที่จับในแต่ละเฟรม ตามลำดับที่เกิดขึ้น
+# input: อ่านคิวอินพุต, ai: ผู้เล่นคอมพิวเตอร์, physics: simulation.step รวมการชนทั้งหมด (หรือ rollback ในโหมดเน็ตเวิร์ก)
+# events: เล่นเสียง/บันทึก replay ตามเหตุการณ์, render: ย้ายภาพตามสถานะ, hud: อัปเดตข้อความคะแนน
+# audio: สั่งเล่นเสียงจริงใน SoundMixer.flush, draw: ตั้งแต่จบ update จนถึงก่อนสลับบัฟเฟอร์ (Kivy วาดจอ)
+PHASES = ('input', 'ai', 'physics', 'events', 'render', 'hud', 'audio', 'draw')
+HISTORY = 600  # เก็บย้อนหลัง 10 วินาทีที่ 60 fps
+
+
+class FrameProfiler:
+    # จับเวลาทีละช่วงด้วย lap() ซึ่งวัดเวลาตั้งแต่ lap ครั้งก่อน
+    # ตอนปิดอยู่ทุกเมธอดคืนค่าทันที จึงแทบไม่มีต้นทุน
+
+    def __init__(self, history=HISTORY):
+        self.enabled = False
+        self.frames = deque(maxlen=history)  # (เวลาเริ่ม, ระยะเวลาทั้งเฟรม, เวลาแต่ละช่วง)
+        self.spans = deque(maxlen=history * len(PHASES) * 2)  # (ช่วง, เวลาเริ่ม, ระยะเวลา) สำหรับ trace
+        self._index = {name: i for i, name in enumerate(PHASES)}
+        self._frame_start = None
+        self._last = 0.0
+        self._current = [0.0] * len(PHASES)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._frame_start = None
+        return self.enabled
+
+    def pause(self):
+        # เกมหยุดเดิน เฟรมที่ค้างอยู่ไม่ต้องนับ
+        self._frame_start = None
+
+    def clear(self):
+        self.frames.clear()
+        self.spans.clear()
+        self._frame_start = None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.frames.append((self._frame_start, now - self._frame_start, tuple(self._current)))
+        self._frame_start = now
+        self._last = now
+        self._current = [0.0] * len(PHASES)
+
+    def lap(self, phase):
+        if not self.enabled or self._frame_start is None:
+            return
+        now = time.perf_counter()
+        self._record(phase, self._last, now - self._last)
+        self._last = now
+
+    def add(self, phase, start, duration):
+        # สำหรับงานที่ไม่ได้อยู่ในลำดับของ update เช่น callback ของ Clock
+        if not self.enabled or self._frame_start is None:
+            return
+        self._record(phase, start, duration)
+
+    def _record(self, phase, start, duration):
+        self._current[self._index[phase]] += duration
+        self.spans.append((phase, start, duration))
+
+    def summary(self, frames=None):
+        # คืน (ค่าเฉลี่ย, ค่าสูงสุด) เป็นมิลลิวินาทีของทั้งเฟรมและแต่ละช่วง
+        frames = list(self.frames)[-frames:] if frames else list(self.frames)
+        if not frames:
+            return {}
+        result = {'frame': (sum(f[1] for f in frames) / len(frames) * 1000, max(f[1] for f in frames) * 1000)}
+        for i, name in enumerate(PHASES):
+            values = [f[2][i] for f in frames]
+            result[name] = (sum(values) / len(values) * 1000, max(values) * 1000)
+        return result
+
+    def export_chrome_trace(self, path):
+        # เปิดดูได้ใน chrome://tracing หรือ https://ui.perfetto.dev
+        if not self.frames and not self.spans:
+            return
+        origin = min([f[0] for f in self.frames] + [s[1] for s in self.spans])
+        events = [{'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                   'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+                  for start, duration, _ in self.frames]
+        events.extend({'name': phase, 'ph': 'X', 'pid': 1, 'tid': 2,
+                       'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+                      for phase, start, duration in self.spans)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export_csv(self, path):
+        if not self.frames:
+            return
+        origin = self.frames[0][0]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'start_ms', 'frame_ms'] + [f'{name}_ms' for name in PHASES])
+            for number, (start, duration, phases) in enumerate(self.frames):
+                writer.writerow([number, f'{(start - origin) * 1000:.3f}', f'{duration * 1000:.3f}']
+                                + [f'{value * 1000:.3f}' for value in phases])
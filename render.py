@@ -0,0 +1,164 @@
+from kivy.clock import Clock
+from kivy.graphics import Color, Ellipse, InstructionGroup, Line, Mesh, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+
+from particles import FADE_STEPS, PALETTE, palette_pixels
+from simulation import BALL_SIZE, PADDLE_HEIGHT, PADDLE_WIDTH
+
+GRAPH_MS = 1000 / 30  # ความสูงเต็มกราฟ = เฟรมละ 33 ms
+FRAME_BUDGET_MS = 1000 / 60
+
+
+class TextureAtlas:
+    # รวมหลายรูปไว้ใน texture เดียว ทุกตัวละครจึงใช้ texture ร่วมกันตอนวาด
+
+    def __init__(self, sources, load_texture, padding=1):
+        textures = [load_texture(source) for source in sources]
+        width = sum(texture.width for texture in textures) + padding * (len(textures) - 1)
+        height = max(texture.height for texture in textures)
+        self.texture = Texture.create(size=(width, height), colorfmt='rgba')
+        self.regions = {}
+        x = 0
+        for source, texture in zip(sources, textures):
+            self.texture.blit_buffer(texture.pixels, pos=(x, 0), size=texture.size,
+                                     colorfmt='rgba', bufferfmt='ubyte')
+            region = self.texture.get_region(x, 0, texture.width, texture.height)
+            # texture.pixels เรียงแถวบนสุดก่อน แต่ blit_buffer ถือว่าแถวแรกคือแถวล่างสุด region จึงต้องกลับด้าน
+            region.flip_vertical()
+            self.regions[source] = region
+            x += texture.width + padding
+
+    def __getitem__(self, source):
+        return self.regions[source]
+
+    def mismatches(self, load_texture):
+        # รูปที่ region ใน atlas ไม่ตรงกับต้นฉบับ (เช่นกลับหัว) อ่าน pixels ผ่าน FBO จึงใช้ตรวจเท่านั้น
+        return [source for source, region in self.regions.items() if region.pixels != load_texture(source).pixels]
+
+
+class CourtRenderer:
+    # วาดลูกบอล ผู้เล่น และตาข่ายด้วย instruction ธรรมดาบน canvas เดียว
+    # แทนการใช้ widget หนึ่งตัวต่อหนึ่งวัตถุที่ต้อง dispatch property ทุกครั้งที่ขยับ
+
+    def __init__(self, canvas, atlas, player1_source, player2_source):
+        self.atlas = atlas
+        self.sources = (player1_source, player2_source)
+        self.group = InstructionGroup()
+        canvas.add(self.group)
+        self.set_entities(1, 2)
+
+    def set_entities(self, balls, paddles):
+        # สร้าง instruction ใหม่ตามจำนวนลูกบอลและผู้เล่น ผู้เล่นทีมเดียวกันใช้รูปเดียวกัน
+        group = self.group
+        group.clear()
+        group.add(Color(1, 1, 1, 1))
+        self.paddles = [Rectangle(texture=self.atlas[self.sources[i % 2]], size=(PADDLE_WIDTH, PADDLE_HEIGHT))
+                        for i in range(paddles)]
+        for paddle in self.paddles:
+            group.add(paddle)
+        group.add(Color(1, 1, 0))
+        self.balls = [Ellipse(size=(BALL_SIZE, BALL_SIZE)) for _ in range(balls)]
+        for ball in self.balls:
+            group.add(ball)
+        group.add(Color(0, 0, 0))
+        self.net = Rectangle()
+        group.add(self.net)
+
+    def set_net(self, net):
+        self.net.pos = (net.x, 0)
+        self.net.size = (net.thickness, net.height)
+
+    def sync(self, positions):
+        # อัปเดตตำแหน่งทุกอย่างในครั้งเดียวต่อเฟรม positions คือ x, y ของลูกบอลทุกลูกแล้วต่อด้วยผู้เล่นทุกคน
+        i = 0
+        for ball in self.balls:
+            ball.pos = (positions[i], positions[i + 1])
+            i += 2
+        for paddle in self.paddles:
+            paddle.pos = (positions[i], positions[i + 1])
+            i += 2
+
+
+class ParticleRenderer:
+    # วาดอนุภาคทั้ง pool ด้วย Mesh เดียว สีและความจางมาจาก texture palette จึงไม่ต้องมี Color ต่ออนุภาค
+    # indices ตั้งครั้งเดียว ส่วน vertices ส่ง array ของ pool ให้ Mesh ตรง ๆ เฉพาะเฟรมที่มีการเปลี่ยนแปลง
+
+    def __init__(self, canvas, pool):
+        self.pool = pool
+        palette = Texture.create(size=(len(PALETTE), FADE_STEPS), colorfmt='rgba')
+        palette.blit_buffer(palette_pixels(), colorfmt='rgba', bufferfmt='ubyte')
+        indices = []
+        for i in range(pool.capacity):
+            first = i * 4
+            indices += (first, first + 1, first + 2, first, first + 2, first + 3)
+        group = InstructionGroup()
+        group.add(Color(1, 1, 1, 1))
+        self.mesh = Mesh(vertices=pool.vertices, indices=indices, mode='triangles', texture=palette)
+        group.add(self.mesh)
+        canvas.add(group)
+
+    def sync(self):
+        pool = self.pool
+        if pool.dirty:
+            self.mesh.vertices = pool.vertices
+            pool.dirty = False
+
+
+class ProfilerOverlay(Widget):
+    # กราฟเวลาของแต่ละเฟรมย้อนหลัง และเวลาเฉลี่ย/สูงสุดของแต่ละช่วงใน 60 เฟรมล่าสุด
+    # วาดใหม่แค่ 10 ครั้งต่อวินาทีและเฉพาะตอนเปิดอยู่
+
+    def __init__(self, profiler, **kwargs):
+        super().__init__(**kwargs)
+        self.profiler = profiler
+        with self.canvas:
+            Color(0, 0, 0, 0.6)
+            self.panel = Rectangle()
+            Color(0.3, 1, 0.3)
+            self.budget_line = Line()  # เส้น 16.7 ms (60 fps)
+            Color(1, 0.4, 0.3)
+            self.graph = Line()
+        self.label = Label(font_name='RobotoMono-Regular', font_size=12, halign='left', valign='top')
+        self.add_widget(self.label)
+        self.bind(pos=self._layout, size=self._layout)
+        self._refresh_event = None
+        self.opacity = 0
+
+    def _layout(self, *args):
+        x, y = self.pos
+        graph_height = self.height * 0.35
+        self.panel.pos = self.pos
+        self.panel.size = self.size
+        budget_y = y + FRAME_BUDGET_MS / GRAPH_MS * graph_height
+        self.budget_line.points = (x, budget_y, x + self.width, budget_y)
+        self.label.pos = (x + 6, y + graph_height)
+        self.label.size = (self.width - 12, self.height - graph_height)
+        self.label.text_size = self.label.size
+
+    def show(self):
+        self.opacity = 1
+        if self._refresh_event is None:
+            self._refresh_event = Clock.schedule_interval(self.refresh, 0.1)
+
+    def hide(self):
+        self.opacity = 0
+        if self._refresh_event is not None:
+            self._refresh_event.cancel()
+            self._refresh_event = None
+
+    def refresh(self, *args):
+        frames = self.profiler.frames
+        x, y = self.pos
+        graph_height = self.height * 0.35
+        spacing = self.width / max(1, frames.maxlen - 1)
+        points = []
+        for i, (_, duration, _) in enumerate(frames):
+            points.append(x + i * spacing)
+            points.append(y + min(duration * 1000 / GRAPH_MS, 1.0) * graph_height)
+        self.graph.points = points
+        lines = [f"{'phase':<8}{'mean':>7}{'max':>7} ms"]
+        for name, (mean, peak) in self.profiler.summary(60).items():
+            lines.append(f"{name:<8}{mean:7.2f}{peak:7.2f}")
+        self.label.text = "\n".join(lines)
@@ -0,0 +1,209 @@
+import argparse
+import bisect
+import struct
+import zlib
+from array import array
+
+from simulation import SERVE, MatchState, restore, snapshot, snapshot_size, step
+
+MAGIC = b'VBR2'
+MAGIC_V1 = b'VBR1'  # ไฟล์รุ่นแรก เป็นโหมด 1 ต่อ 1 เสมอ
+SNAPSHOT_INTERVAL = 300  # บันทึกสถานะทุก ๆ 300 tick (5 วินาที)
+# magic, ช่วง snapshot, จำนวน tick, จำนวนเสิร์ฟ, จำนวน snapshot, คะแนนชนะ, ความเร็วเสิร์ฟ x, y
+HEADER = struct.Struct('<4sIIIIIdd')
+ENTITIES = struct.Struct('<BB')  # จำนวนลูกบอล, จำนวนผู้เล่น (ต่อจาก HEADER ตั้งแต่ VBR2)
+
+
+class Replay:
+    # log ของแมตช์หนึ่งเก็บเป็นอาร์เรย์ล้วน ๆ:
+    # inputs[i] คือ bitmask ของ tick ที่ i + 1, snapshots คือสถานะทุก ๆ interval tick
+    # (snapshot แรกคือสถานะตอนเริ่ม) ต่อท้ายด้วยสถานะตอนจบถ้าแมตช์ไม่ได้จบตรงรอบพอดี
+    # serve_ticks/serve_players คือเหตุการณ์เสิร์ฟ
+
+    def __init__(self, interval=SNAPSHOT_INTERVAL, win_score=7, serve_velocity=(6, 6), balls=1, paddles=2):
+        self.interval = interval
+        self.win_score = win_score
+        self.serve_velocity = serve_velocity
+        self.balls = balls
+        self.paddles = paddles
+        self.snapshot_size = snapshot_size(balls, paddles)
+        self.inputs = array('B' if paddles <= 2 else 'H')  # ผู้เล่น 4 คนใช้ 12 บิต
+        self.snapshots = array('d')
+        self.serve_ticks = array('I')
+        self.serve_players = array('B')
+
+    @property
+    def ticks(self):
+        return len(self.inputs)
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, self.interval, len(self.inputs), len(self.serve_ticks),
+                             self.snapshot_count, self.win_score, *self.serve_velocity)
+        header += ENTITIES.pack(self.balls, self.paddles)
+        body = b''.join(a.tobytes() for a in (self.inputs, self.serve_players, self.serve_ticks, self.snapshots))
+        return header + zlib.compress(body, 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, interval, ticks, serves, snapshots, win_score, serve_vx, serve_vy = HEADER.unpack_from(data)
+        if magic == MAGIC:
+            balls, paddles = ENTITIES.unpack_from(data, HEADER.size)
+            start = HEADER.size + ENTITIES.size
+        elif magic == MAGIC_V1:
+            balls, paddles = 1, 2
+            start = HEADER.size
+        else:
+            raise ValueError("not a volleyball replay file")
+        replay = cls(interval, win_score, (serve_vx, serve_vy), balls, paddles)
+        body = memoryview(zlib.decompress(data[start:]))
+        offset = 0
+        for target, count in ((replay.inputs, ticks), (replay.serve_players, serves),
+                              (replay.serve_ticks, serves), (replay.snapshots, snapshots * replay.snapshot_size)):
+            size = count * target.itemsize
+            target.frombytes(body[offset:offset + size])
+            offset += size
+        return replay
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    @property
+    def snapshot_count(self):
+        return len(self.snapshots) // self.snapshot_size
+
+    def snapshot_at(self, index):
+        start = index * self.snapshot_size
+        return self.snapshots[start:start + self.snapshot_size]
+
+    @property
+    def interval_count(self):
+        # จำนวน snapshot ที่อยู่ตรงรอบ interval (ไม่นับ snapshot ตอนจบ) ค่าแรกของ snapshot คือ tick
+        count = self.snapshot_count
+        if count > 1 and self.snapshots[(count - 1) * self.snapshot_size] != (count - 1) * self.interval:
+            return count - 1
+        return count
+
+    @property
+    def final_snapshot(self):
+        # สถานะตอนจบที่ไม่ตรงรอบ interval หรือ None (ไฟล์เก่า หรือแมตช์จบตรงรอบพอดี)
+        if self.interval_count == self.snapshot_count:
+            return None
+        return self.snapshot_at(self.snapshot_count - 1)
+
+
+class ReplayRecorder:
+    # เรียก record() หลัง simulation.step ทุก tick
+
+    def __init__(self, match, interval=SNAPSHOT_INTERVAL):
+        self.match = match
+        self.replay = Replay(interval, match.win_score, match.serve_velocity,
+                             len(match.balls), len(match.paddles))
+        self.replay.snapshots.extend(snapshot(match))
+        self._record_serve(0)
+
+    def _record_serve(self, tick):
+        # หลังเสิร์ฟ serving_player คือคนที่จะเสิร์ฟครั้งถัดไป
+        self.replay.serve_ticks.append(tick)
+        self.replay.serve_players.append(2 if self.match.serving_player == 1 else 1)
+
+    def record(self, inputs, events):
+        replay = self.replay
+        replay.inputs.append(inputs)
+        tick = self.match.tick
+        for kind, x, y in events:
+            if kind == SERVE:
+                self._record_serve(tick)
+        if tick % replay.interval == 0:
+            replay.snapshots.extend(snapshot(self.match))
+
+    def finish(self):
+        # เรียกก่อนบันทึกไฟล์ เก็บสถานะตอนจบไว้ด้วย verify จะได้ตรวจถึง tick สุดท้าย ไม่ใช่แค่ถึงรอบล่าสุด
+        replay = self.replay
+        if replay.snapshot_at(replay.snapshot_count - 1)[0] != self.match.tick:
+            replay.snapshots.extend(snapshot(self.match))
+        return replay
+
+
+class ReplayPlayer:
+    # เล่น replay ซ้ำโดยจำลองจาก input เดิม กระโดดไป tick ใดก็ได้จาก snapshot ที่ใกล้ที่สุด
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.match = MatchState(win_score=replay.win_score, serve_velocity=replay.serve_velocity,
+                                balls=replay.balls, paddles=replay.paddles)
+        self.seek(0)
+
+    @property
+    def tick(self):
+        return self.match.tick
+
+    def seek(self, tick):
+        replay = self.replay
+        tick = max(0, min(tick, replay.ticks))
+        index = min(tick // replay.interval, replay.interval_count - 1)
+        restore(self.match, replay.snapshot_at(index))
+        while self.match.tick < tick:
+            self.step()
+        return self.match
+
+    def seek_serve(self, number):
+        # กระโดดไปที่การเสิร์ฟครั้งที่ number (เริ่มที่ 0)
+        return self.seek(self.replay.serve_ticks[number])
+
+    def step(self):
+        if self.match.tick >= self.replay.ticks:
+            return None
+        return step(self.match, self.replay.inputs[self.match.tick])
+
+    def verify(self):
+        # จำลองทั้งแมตช์ใหม่แล้วเทียบกับ snapshot ที่บันทึกไว้รวมถึงสถานะตอนจบ คืน tick แรกที่ไม่ตรง หรือ None
+        replay = self.replay
+        self.seek(0)
+        for index in range(1, replay.snapshot_count):
+            if index < replay.interval_count:
+                self.seek_forward(index * replay.interval)
+            else:
+                self.seek_forward(replay.ticks)
+            if array('d', snapshot(self.match)) != replay.snapshot_at(index):
+                return self.match.tick
+        return None
+
+    def seek_forward(self, tick):
+        while self.match.tick < tick and self.step() is not None:
+            pass
+
+    def serve_index(self, tick):
+        return bisect.bisect_right(self.replay.serve_ticks, tick) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="เปิดดูและตรวจสอบไฟล์ replay")
+    parser.add_argument('path')
+    parser.add_argument('--seek', type=int, help="แสดงสถานะของเกมที่ tick นี้")
+    parser.add_argument('--verify', action='store_true', help="จำลองใหม่ทั้งแมตช์แล้วเทียบกับ snapshot")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    print(f"{replay.ticks} ticks, {len(replay.serve_ticks)} serves, "
+          f"{replay.interval_count} snapshots every {replay.interval} ticks"
+          f"{' + final' if replay.final_snapshot is not None else ''}, "
+          f"{replay.balls} ball(s), {replay.paddles} players")
+    player = ReplayPlayer(replay)
+    if args.verify:
+        mismatch = player.verify()
+        print("replay is deterministic" if mismatch is None else f"replay diverges at tick {mismatch}")
+    if args.seek is not None:
+        match = player.seek(args.seek)
+        print(f"tick {match.tick}: score {match.player1_score}-{match.player2_score}, "
+              f"ball ({match.ball.x:.1f}, {match.ball.y:.1f}) velocity ({match.ball.vx:.2f}, {match.ball.vy:.2f}), "
+              f"serve #{player.serve_index(match.tick)}")
+
+
+if __name__ == '__main__':
+    main()
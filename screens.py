@@ -0,0 +1,29 @@
+class ScreenGraph:
+    # สร้างแต่ละหน้าจอครั้งเดียวแล้วเก็บไว้ใช้ซ้ำ สลับหน้าจอด้วยการถอด/ใส่ widget ที่ root
+    # แทนการสร้าง layout และปุ่มทั้งหมดใหม่ทุกครั้งที่กลับมาหน้าเดิม
+
+    def __init__(self, root):
+        self.root = root
+        self.builders = {}
+        self.screens = {}
+        self.current = None
+
+    def add(self, name, builder, lazy=True):
+        # lazy=True จะสร้างหน้าจอตอนถูกเปิดครั้งแรก
+        self.builders[name] = builder
+        if not lazy:
+            self.get(name)
+
+    def get(self, name):
+        screen = self.screens.get(name)
+        if screen is None:
+            screen = self.screens[name] = self.builders[name]()
+        return screen
+
+    def show(self, name):
+        screen = self.get(name)
+        if self.current != name:
+            self.root.clear_widgets()
+            self.root.add_widget(screen)
+            self.current = name
+        return screen
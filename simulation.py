@@ -0,0 +1,440 @@
+import math
+
+from broadphase import UniformGrid
+from collision import circle_overlaps_aabb, sweep_circle_aabb
+
+# สนามมีขนาดคงที่ (หน่วยตรรกะ ไม่ใช่พิกเซลของจอ) ฟิสิกส์จึงเหมือนกันทุกขนาดหน้าต่าง
+COURT_WIDTH = 800
+COURT_HEIGHT = 600
+BALL_SIZE = 30
+PADDLE_WIDTH = 100
+PADDLE_HEIGHT = 150
+NET_THICKNESS = 10
+GRAVITY = -0.5
+JUMP_STRENGTH = 10
+PADDLE_SPEED = 7  # ความเร็วของผู้เล่น
+SPEED_FACTOR = 1.001  # อัตราเร่งของลูกบอลต่อหนึ่ง tick
+# ความเร็วสูงสุดของลูกบอล (px/tick) ไม่เกินเส้นผ่านศูนย์กลางของมัน ระหว่างสองผิวที่ชนต่อกันจึงต้องเดินทางจริง
+# และหนึ่ง tick จบได้ภายใน MAX_CONTACTS เสมอ ถ้าไม่จำกัด การตีโต้ยาว ๆ จะเร่งไปเรื่อย ๆ จนลูกบอลค้างที่มุม
+MAX_BALL_SPEED = 30.0
+SERVE_VELOCITY = (6, 6)
+WIN_SCORE = 7
+MAX_CONTACTS = 8  # จำนวนครั้งที่ลูกบอลเด้งได้มากที่สุดในหนึ่ง tick
+
+# ปุ่มที่กดในหนึ่ง tick เก็บเป็น bitmask ผู้เล่นคนที่ i ใช้บิต 3i ถึง 3i + 2
+P1_JUMP = 1
+P1_LEFT = 2
+P1_RIGHT = 4
+P2_JUMP = 8
+P2_LEFT = 16
+P2_RIGHT = 32
+P3_JUMP = 64
+P3_LEFT = 128
+P3_RIGHT = 256
+P4_JUMP = 512
+P4_LEFT = 1024
+P4_RIGHT = 2048
+PLAYER1_INPUTS = P1_JUMP | P1_LEFT | P1_RIGHT
+PLAYER2_INPUTS = P2_JUMP | P2_LEFT | P2_RIGHT
+PLAYER3_INPUTS = P3_JUMP | P3_LEFT | P3_RIGHT
+PLAYER4_INPUTS = P4_JUMP | P4_LEFT | P4_RIGHT
+INPUT_BITS = 3  # จำนวนบิตต่อผู้เล่น
+
+# โหมดเกม -> (จำนวนลูกบอล, จำนวนผู้เล่น) ผู้เล่นลำดับคี่อยู่ทีมซ้าย ลำดับคู่อยู่ทีมขวา
+MODES = {
+    'classic': (1, 2),
+    'party': (8, 2),
+    'doubles': (1, 4),
+}
+
+# ชนิดของเหตุการณ์ที่ step() คืนค่าออกมา
+HIT_WALL = 'wall'
+HIT_PADDLE = 'paddle'
+HIT_NET = 'net'
+POINT = 'point'
+SERVE = 'serve'
+WIN = 'win'
+
+
+def _overlap(ax, ay, aw, ah, bx, by, bw, bh):
+    # เงื่อนไขเดียวกับ Widget.collide_widget (ขอบที่แตะกันนับว่าชน)
+    return not (ax + aw < bx or ax > bx + bw or ay + ah < by or ay > by + bh)
+
+
+class BallState:
+    __slots__ = ('x', 'y', 'vx', 'vy', 'size')
+
+    def __init__(self, x=0.0, y=0.0, vx=SERVE_VELOCITY[0], vy=SERVE_VELOCITY[1], size=BALL_SIZE):
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.size = size
+
+    @property
+    def center_x(self):
+        return self.x + self.size / 2
+
+    @property
+    def top(self):
+        return self.y + self.size
+
+    @property
+    def right(self):
+        return self.x + self.size
+
+    def move(self):
+        self.x += self.vx
+        self.y += self.vy
+
+    def increase_speed(self, factor=SPEED_FACTOR, limit=MAX_BALL_SPEED):
+        vx = self.vx * factor
+        vy = self.vy * factor
+        speed_sq = vx * vx + vy * vy
+        if speed_sq > limit * limit:
+            scale = limit / math.sqrt(speed_sq)
+            vx *= scale
+            vy *= scale
+        self.vx = vx
+        self.vy = vy
+
+
+class PaddleState:
+    __slots__ = ('x', 'y', 'vy', 'width', 'height', 'gravity', 'jump_strength', 'speed', 'team')
+
+    def __init__(self, x=0.0, y=0.0, team=1):
+        self.x = x
+        self.y = y
+        self.team = team  # 1 = ฝั่งซ้ายของตาข่าย, 2 = ฝั่งขวา
+        self.vy = 0.0
+        self.width = PADDLE_WIDTH
+        self.height = PADDLE_HEIGHT
+        self.gravity = GRAVITY
+        self.jump_strength = JUMP_STRENGTH
+        self.speed = PADDLE_SPEED
+
+    @property
+    def center_x(self):
+        return self.x + self.width / 2
+
+    @property
+    def top(self):
+        return self.y + self.height
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    def move(self):
+        self.vy += self.gravity
+        self.y += self.vy
+        if self.y < 0:
+            self.y = 0
+            self.vy = 0
+
+    def jump(self):
+        if self.y == 0:
+            self.vy = self.jump_strength
+
+    def move_left(self):
+        if self.x - self.speed >= 0:  # ป้องกันไม่ให้เคลื่อนที่ออกนอกขอบด้านซ้าย
+            self.x -= self.speed
+
+    def move_right(self, court_width):
+        if self.right + self.speed <= court_width:  # ป้องกันไม่ให้เคลื่อนที่ออกนอกขอบด้านขวา
+            self.x += self.speed
+
+
+class NetState:
+    __slots__ = ('x', 'height', 'thickness')
+
+    def __init__(self, x=0.0, height=180, thickness=NET_THICKNESS):
+        self.x = x
+        self.height = height  # ความสูงของตาข่าย
+        self.thickness = thickness  # ความหนาของตาข่าย
+
+    @property
+    def right(self):
+        return self.x + self.thickness
+
+
+class MatchState:
+    # balls และ paddles คือวัตถุทั้งหมดในสนาม ball, player1, player2 ชี้ไปที่ตัวแรก ๆ ของรายการ
+    # เพื่อให้โค้ดที่เขียนสำหรับโหมด 1 ต่อ 1 ใช้ได้เหมือนเดิม
+    __slots__ = ('width', 'height', 'balls', 'paddles', 'ball', 'player1', 'player2', 'net', 'grid',
+                 'player1_score', 'player2_score', 'serving_player', 'winner',
+                 'tick', 'win_score', 'serve_velocity')
+
+    def __init__(self, width=COURT_WIDTH, height=COURT_HEIGHT, win_score=WIN_SCORE,
+                 serve_velocity=SERVE_VELOCITY, balls=1, paddles=2):
+        self.balls = [BallState() for _ in range(balls)]
+        self.paddles = [PaddleState(team=1 + i % 2) for i in range(paddles)]
+        self.ball = self.balls[0]
+        self.player1 = self.paddles[0]
+        self.player2 = self.paddles[1]
+        self.net = NetState()
+        self.player1_score = 0
+        self.player2_score = 0
+        self.serving_player = 1  # ผู้ที่จะเริ่มเสิร์ฟ
+        self.winner = 0
+        self.tick = 0
+        self.win_score = win_score
+        self.serve_velocity = serve_velocity
+        layout(self, width, height)
+
+
+def layout(match, width, height):
+    # จัดตำแหน่งเริ่มต้นตามขนาดสนาม
+    match.width = width
+    match.height = height
+    for i, paddle in enumerate(match.paddles):
+        offset = i // 2 * width / 4  # ผู้เล่นคนที่สองของทีมยืนใกล้ตาข่ายกว่า
+        paddle.x = 50 + offset if paddle.team == 1 else width - 100 - offset
+        paddle.y = height / 2
+    for ball in match.balls:
+        ball.x = width / 2 - ball.size / 2
+        ball.y = height / 2 - ball.size / 2
+    match.net.x = width / 2 - match.net.thickness / 2
+    match.net.height = height * 2 / 5  # ความสูงของตาข่ายเป็น 2/5 ของความสูงสนาม
+    match.grid = UniformGrid(width, height)
+
+
+def serve(match, velocity=None, ball=None):  # การสลับกันเสิร์ฟ
+    vx, vy = velocity if velocity is not None else match.serve_velocity
+    if ball is None:
+        ball = match.ball
+    if match.serving_player == 1:
+        server = match.player1
+        ball.vx, ball.vy = vx, vy
+        match.serving_player = 2  # เสิร์ฟครั้งต่อไปจะเป็นผู้เล่น 2
+    else:
+        server = match.player2
+        ball.vx, ball.vy = -vx, vy
+        match.serving_player = 1  # เสิร์ฟครั้งต่อไปจะเป็นผู้เล่น 1
+    ball.x = server.center_x - ball.size / 2
+    ball.y = server.top + ball.size / 2
+
+
+def kickoff(match, velocity=None):
+    # เริ่มแมตช์: เสิร์ฟลูกแรกตามปกติ ลูกที่เหลือ (โหมด party) ปล่อยลงจากเหนือตาข่ายสลับซ้ายขวา
+    serve(match, velocity)
+    vx, vy = velocity if velocity is not None else match.serve_velocity
+    for i, ball in enumerate(match.balls[1:]):
+        side = -1 if i % 2 == 0 else 1
+        row = i // 2
+        ball.x = match.width / 2 - ball.size / 2 + side * (60 + 40 * row)
+        ball.y = match.height * 0.8 - ball.size * row
+        ball.vx, ball.vy = side * vx, -vy
+
+
+def reset_match(match):
+    match.player1_score = 0
+    match.player2_score = 0
+    match.winner = 0
+    match.tick = 0
+    for ball in match.balls:
+        ball.x = match.width / 2 - ball.size / 2
+        ball.y = match.height / 2 - ball.size / 2
+        ball.vx, ball.vy = match.serve_velocity
+
+
+def snapshot(match):
+    # สถานะทั้งหมดของแมตช์เป็น tuple ของตัวเลข ใช้บันทึก replay และย้อนเวลา
+    # ลำดับ: tick, ขนาดสนาม, ตาข่าย, ลูกบอลทุกลูก (x, y, vx, vy), ผู้เล่นทุกคน (x, y, vy), คะแนน
+    data = [match.tick, match.width, match.height, match.net.x, match.net.height]
+    for ball in match.balls:
+        data += (ball.x, ball.y, ball.vx, ball.vy)
+    for paddle in match.paddles:
+        data += (paddle.x, paddle.y, paddle.vy)
+    data += (match.player1_score, match.player2_score, match.serving_player, match.winner)
+    return tuple(data)
+
+
+def snapshot_size(balls=1, paddles=2):
+    return 9 + 4 * balls + 3 * paddles
+
+
+def restore(match, data):
+    tick, match.width, match.height, match.net.x, match.net.height = data[:5]
+    i = 5
+    for ball in match.balls:
+        ball.x, ball.y, ball.vx, ball.vy = data[i:i + 4]
+        i += 4
+    for paddle in match.paddles:
+        paddle.x, paddle.y, paddle.vy = data[i:i + 3]
+        i += 3
+    player1_score, player2_score, serving_player, winner = data[i:i + 4]
+    match.tick = int(tick)
+    match.player1_score = int(player1_score)
+    match.player2_score = int(player2_score)
+    match.serving_player = int(serving_player)
+    match.winner = int(winner)
+
+
+def _bounce_off_paddle(ball, paddle, push_out=True):
+    # push_out=False ใช้กับ swept collision ที่ลูกบอลอยู่ตรงจุดสัมผัสพอดีแล้ว
+    if ball.center_x < paddle.center_x:
+        ball.vx = -abs(ball.vx)  # ทำให้ลูกบอลกระเด็นไปทางซ้าย
+        if push_out:
+            ball.x = paddle.x - ball.size  # ปรับตำแหน่งลูกบอลไปทางซ้ายของผู้เล่น
+    else:
+        ball.vx = abs(ball.vx)  # ทำให้ลูกบอลกระเด็นไปทางขวา
+        if push_out:
+            ball.x = paddle.right  # ปรับตำแหน่งลูกบอลไปทางขวาของผู้เล่น
+    ball.vy = abs(ball.vy)  # ทำให้ลูกบอลกระเด็นขึ้น
+
+
+def _resolve_overlaps(match, ball, events):
+    # กรณีที่เริ่ม tick มาก็ซ้อนกันอยู่แล้ว (เช่นผู้เล่นกระโดดขึ้นมาโดนลูกบอล) แก้แบบไม่ต่อเนื่อง
+    r = ball.size / 2
+    cx = ball.x + r
+    cy = ball.y + r
+    for paddle in match.grid.query(ball.x, ball.y, ball.x + ball.size, ball.y + ball.size):
+        if circle_overlaps_aabb(cx, cy, r, paddle.x, paddle.y, paddle.right, paddle.top):
+            if cy > paddle.top:
+                # ผู้เล่นกระโดดขึ้นมาใต้ลูกบอล ให้ดันลูกบอลขึ้นไปบนหัวแทนการดันไปด้านข้าง
+                ball.y = paddle.top
+                _bounce_off_paddle(ball, paddle, push_out=False)
+            else:
+                _bounce_off_paddle(ball, paddle)
+            events.append((HIT_PADDLE, ball.x, ball.y))
+            cx = ball.x + r
+            cy = ball.y + r
+            break
+    net = match.net
+    if circle_overlaps_aabb(cx, cy, r, net.x, 0, net.right, net.height):
+        if cx < net.x + net.thickness / 2:
+            ball.x = net.x - ball.size
+            ball.vx = -abs(ball.vx)
+        else:
+            ball.x = net.right
+            ball.vx = abs(ball.vx)
+        events.append((HIT_NET, ball.x, ball.y))
+    # อย่าดันลูกบอลออกนอกสนาม
+    ball.x = min(max(ball.x, 0), match.width - ball.size)
+
+
+def _sweep_ball(match, ball, events):
+    # เคลื่อนลูกบอลตลอดหนึ่ง tick โดยหาเวลาที่ชนจริงของแต่ละผิว (swept collision)
+    # จึงไม่ทะลุตาข่ายหรือผู้เล่นแม้ลูกบอลจะเร็วมาก และเด้งได้หลายครั้งใน tick เดียว
+    net = match.net
+    r = ball.size / 2
+    width = match.width
+    height = match.height
+    remaining = 1.0
+    # ใน tick เดียวลูกบอลเคลื่อนที่ได้ไม่เกินความเร็วของมัน ไม่ว่าจะเด้งกี่ครั้ง
+    reach = math.hypot(ball.vx, ball.vy) + r
+    cx = ball.x + r
+    cy = ball.y + r
+    paddles = match.grid.query(cx - reach, cy - reach, cx + reach, cy + reach)
+    for _ in range(MAX_CONTACTS):
+        cx = ball.x + r
+        cy = ball.y + r
+        dx = ball.vx * remaining
+        dy = ball.vy * remaining
+        best_t = math.inf
+        hit = None
+
+        # ผนังด้านบน ซ้าย ขวา และพื้น (ถ้าทะลุไปแล้วถือว่าชนทันที)
+        if dy > 0:
+            t = (height - r - cy) / dy
+            if t <= 1 and t < best_t:
+                best_t, hit = t, (HIT_WALL, None, 0.0, -1.0)
+        if dx < 0:
+            t = (r - cx) / dx
+            if t <= 1 and t < best_t:
+                best_t, hit = t, (HIT_WALL, None, 1.0, 0.0)
+        elif dx > 0:
+            t = (width - r - cx) / dx
+            if t <= 1 and t < best_t:
+                best_t, hit = t, (HIT_WALL, None, -1.0, 0.0)
+        if dy < 0:
+            t = (r - cy) / dy
+            if t <= 1 and t < best_t:
+                best_t, hit = t, (POINT, None, 0.0, 1.0)
+
+        # ตาข่ายอยู่กับที่และมีชิ้นเดียว ตรวจตรง ๆ เหมือนผนัง ส่วนผู้เล่นตรวจเฉพาะที่อยู่ใกล้
+        contact = sweep_circle_aabb(cx, cy, dx, dy, r, net.x, 0, net.right, net.height)
+        if contact is not None and contact[0] < best_t:
+            best_t, hit = contact[0], (HIT_NET, net, contact[1], contact[2])
+        for paddle in paddles:
+            contact = sweep_circle_aabb(cx, cy, dx, dy, r, paddle.x, paddle.y, paddle.right, paddle.top)
+            if contact is not None and contact[0] < best_t:
+                best_t, hit = contact[0], (HIT_PADDLE, paddle, contact[1], contact[2])
+
+        if hit is None:
+            ball.x += dx
+            ball.y += dy
+            return
+
+        t = max(best_t, 0.0)
+        ball.x += dx * t
+        ball.y += dy * t
+        remaining *= 1.0 - t
+        kind, paddle, nx, ny = hit
+
+        if kind == POINT:
+            # ลูกบอลชนกับด้านล่าง
+            if ball.center_x < width / 2:
+                match.player2_score += 1
+            else:
+                match.player1_score += 1
+            events.append((POINT, ball.x, ball.y))
+            serve(match, ball=ball)
+            events.append((SERVE, ball.x, ball.y))
+            return
+
+        if kind == HIT_PADDLE:
+            _bounce_off_paddle(ball, paddle, push_out=False)
+        dot = ball.vx * nx + ball.vy * ny
+        if dot < 0:
+            # สะท้อนความเร็วตามผิวที่ชน (ผนัง ตาข่าย หรือใต้ตัวผู้เล่น)
+            ball.vx -= 2 * dot * nx
+            ball.vy -= 2 * dot * ny
+        events.append((kind, ball.x, ball.y))
+
+
+def step(match, inputs=0):
+    # เดินเกมไปหนึ่ง tick แล้วคืนรายการเหตุการณ์ (ชนิด, x, y) ที่เกิดขึ้น
+    events = []
+    if match.winner:
+        return events
+    match.tick += 1
+    net = match.net
+    width = match.width
+
+    # ใช้อินพุตตั้งแต่ต้น tick ผู้เล่นจึงขยับใน tick เดียวกับที่กดปุ่ม
+    for paddle in match.paddles:
+        if inputs & P1_JUMP:
+            paddle.jump()
+        if inputs & P1_LEFT:
+            paddle.move_left()
+        if inputs & P1_RIGHT:
+            paddle.move_right(width)
+        inputs >>= INPUT_BITS  # บิตของผู้เล่นคนถัดไปเลื่อนมาอยู่ตำแหน่งเดียวกับ P1
+
+    grid = match.grid
+    for paddle in match.paddles:
+        paddle.move()
+        # ทำให้ผู้เล่นผ่านตาข่ายไม่ได้
+        if _overlap(paddle.x, paddle.y, paddle.width, paddle.height, net.x, 0, net.thickness, net.height):
+            paddle.x = net.x - paddle.width if paddle.team == 1 else net.right
+        grid.insert(paddle, paddle.x, paddle.y, paddle.right, paddle.top)
+
+    # ลูกบอลแต่ละลูกตรวจเฉพาะผู้เล่นที่อยู่ในช่องตารางใกล้ ๆ (ลูกบอลไม่ชนกันเอง)
+    for ball in match.balls:
+        _resolve_overlaps(match, ball, events)
+        _sweep_ball(match, ball, events)
+        # เพิ่มความเร็วของลูกบอล
+        ball.increase_speed()
+
+    ball = match.ball
+
+    # ตรวจสอบเงื่อนไขการชนะ
+    if match.player1_score >= match.win_score:
+        match.winner = 1
+        events.append((WIN, ball.x, ball.y))
+    elif match.player2_score >= match.win_score:
+        match.winner = 2
+        events.append((WIN, ball.x, ball.y))
+    return events
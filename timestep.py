@@ -0,0 +1,31 @@
+TICK_RATE = 60  # จำนวน tick ของฟิสิกส์ต่อวินาที (เท่ากับอัตราเฟรมเดิมของเกม)
+MAX_STEPS = 5  # จำนวน tick สูงสุดที่ยอมให้ไล่ตามในหนึ่งเฟรม
+
+
+class FixedTimestep:
+    # แยกเวลาของฟิสิกส์ออกจากอัตราเฟรม: สะสม dt จริงไว้แล้วเดินเกมทีละ tick คงที่
+
+    def __init__(self, tick_func, rate=TICK_RATE, max_steps=MAX_STEPS):
+        self.tick_func = tick_func
+        self.tick = 1.0 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped = 0  # จำนวน tick ที่ทิ้งไปเพราะเครื่องช้าเกินไล่ทัน
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, dt):
+        # คืนค่า alpha (0..1) สำหรับ interpolate ระหว่างสถานะสองอันล่าสุด
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= self.tick:
+            if steps == self.max_steps:
+                # ไล่ไม่ทันแล้ว ทิ้งเวลาที่เหลือแทนที่จะค้างแบบ spiral of death
+                self.dropped += int(self.accumulator / self.tick)
+                self.accumulator %= self.tick
+                break
+            self.tick_func()
+            self.accumulator -= self.tick
+            steps += 1
+        return self.accumulator / self.tick
@@ -0,0 +1,190 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import time
+
+from ai import DIFFICULTIES, CpuController
+from simulation import MAX_BALL_SPEED, POINT, SERVE, WIN_SCORE, MatchState, serve, step
+
+MAX_TICKS = 60 * 60 * 10  # แมตช์ที่เล่นเกิน 10 นาทีนับว่าเสมอ (AI ระดับสูงตีโต้กันได้ไม่รู้จบ)
+SPEED_BIN = 2.0  # ความกว้างของช่วงในฮิสโทแกรมความเร็วลูกบอล (px/tick)
+SEED = 20240101
+# คู่ที่ --check ต้องเล่นจนมีผู้ชนะทุกแมตช์ (เคยเสมอหมดเพราะลูกบอลเร่งไม่จำกัดจนติดมุมสนาม)
+# และ easy ต้องเสียคะแนนได้จริงทั้งกับ easy และกับระดับที่เก่งกว่า
+CHECK_PAIRS = (('easy', 'easy'), ('easy', 'normal'), ('normal', 'easy'), ('normal', 'normal'))
+CHECK_MATCHES = 4
+
+
+def make_specs(args):
+    # แต่ละแมตช์มี index และ seed ของตัวเอง ผลจึงเหมือนเดิมทุกครั้งไม่ว่าจะใช้กี่โปรเซส
+    configs = itertools.product(args.ai, args.ai, args.serve_speed, args.win_score)
+    index = 0
+    for ai1, ai2, speed, win_score in configs:
+        for _ in range(args.matches):
+            yield (index, args.seed + index, ai1, ai2, speed, win_score, args.max_ticks)
+            index += 1
+
+
+def play_match(spec):
+    index, seed, ai1, ai2, speed, win_score, max_ticks = spec
+    match = MatchState(win_score=win_score, serve_velocity=(speed, speed))
+    serve(match)
+    # budget ใหญ่ ๆ ให้ผลทำนายไม่ขึ้นกับว่าเครื่องยุ่งแค่ไหน แมตช์เดิมจึงได้ผลเดิม
+    players = (CpuController(1, ai1, seed * 2, budget=1.0), CpuController(2, ai2, seed * 2 + 1, budget=1.0))
+    rallies = []  # (จำนวน tick, ความเร็วลูกบอลตอนจบ)
+    rally_start = 0
+    while not match.winner and match.tick < max_ticks:
+        ball = match.ball
+        ball_speed = math.hypot(ball.vx, ball.vy)  # ต้องเก็บก่อน step เพราะการเสิร์ฟใหม่รีเซ็ตความเร็ว
+        events = step(match, players[0].inputs(match) | players[1].inputs(match))
+        if not events:
+            continue
+        for player in players:
+            player.notify(events)
+        for kind, x, y in events:
+            if kind == POINT:
+                rallies.append((match.tick - rally_start, ball_speed))
+            elif kind == SERVE:
+                rally_start = match.tick
+    config = (ai1, ai2, f'{speed:g}', win_score)
+    return index, config, match.winner, match.player1_score, match.player2_score, match.tick, rallies
+
+
+class Report:
+    # รวมผลทีละแมตช์ตามที่ได้รับ ไม่ต้องเก็บผลดิบทั้งหมดไว้
+
+    def __init__(self):
+        self.configs = {}
+
+    def add(self, result):
+        _, config, winner, score1, score2, ticks, rallies = result
+        stats = self.configs.get(config)
+        if stats is None:
+            stats = self.configs[config] = {
+                'matches': 0, 'wins': [0, 0, 0], 'points': [0, 0], 'ticks': 0,
+                'rallies': 0, 'rally_ticks': 0, 'rally_lengths': {}, 'speeds': {}, 'max_speed': 0.0,
+            }
+        stats['matches'] += 1
+        stats['wins'][winner] += 1  # index 0 = เสมอ (เกิน MAX_TICKS)
+        stats['points'][0] += score1
+        stats['points'][1] += score2
+        stats['ticks'] += ticks
+        for length, speed in rallies:
+            stats['rallies'] += 1
+            stats['rally_ticks'] += length
+            bucket = length // 60  # ความยาวการตีโต้ปัดเป็นวินาที
+            stats['rally_lengths'][bucket] = stats['rally_lengths'].get(bucket, 0) + 1
+            bucket = int(speed // SPEED_BIN)
+            stats['speeds'][bucket] = stats['speeds'].get(bucket, 0) + 1
+            stats['max_speed'] = max(stats['max_speed'], speed)
+
+    def rows(self):
+        for (ai1, ai2, speed, win_score), stats in sorted(self.configs.items()):
+            matches = stats['matches']
+            rallies = max(stats['rallies'], 1)
+            yield {
+                'player1': ai1, 'player2': ai2, 'serve_speed': speed, 'win_score': win_score,
+                'matches': matches,
+                'player1_win_rate': stats['wins'][1] / matches,
+                'player2_win_rate': stats['wins'][2] / matches,
+                'draw_rate': stats['wins'][0] / matches,
+                'mean_match_seconds': stats['ticks'] / matches / 60,
+                'mean_rally_seconds': stats['rally_ticks'] / rallies / 60,
+                'rally_p50_seconds': histogram_percentile(stats['rally_lengths'], 0.5),
+                'rally_p90_seconds': histogram_percentile(stats['rally_lengths'], 0.9),
+                'max_ball_speed': stats['max_speed'],
+                'rally_length_histogram': {f'{k}s': v for k, v in sorted(stats['rally_lengths'].items())},
+                'ball_speed_histogram': {f'{k * SPEED_BIN:g}-{(k + 1) * SPEED_BIN:g}': v
+                                         for k, v in sorted(stats['speeds'].items())},
+            }
+
+    def print(self):
+        print(f"{'P1':<7}{'P2':<7}{'serve':>6}{'to':>4}{'n':>7}{'P1 win':>8}{'P2 win':>8}{'draw':>7}"
+              f"{'rally s':>9}{'p90 s':>7}{'max v':>8}")
+        for row in self.rows():
+            print(f"{row['player1']:<7}{row['player2']:<7}{row['serve_speed']:>6}{row['win_score']:>4}"
+                  f"{row['matches']:>7}{row['player1_win_rate']:>8.1%}{row['player2_win_rate']:>8.1%}"
+                  f"{row['draw_rate']:>7.1%}{row['mean_rally_seconds']:>9.2f}{row['rally_p90_seconds']:>7}"
+                  f"{row['max_ball_speed']:>8.1f}")
+
+
+def histogram_percentile(histogram, fraction):
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    seen = 0
+    for bucket, count in sorted(histogram.items()):
+        seen += count
+        if seen >= total * fraction:
+            return bucket
+    return bucket
+
+
+def self_test(args):
+    ok = True
+    index = 0
+    for ai1, ai2 in CHECK_PAIRS:
+        report = Report()
+        for _ in range(CHECK_MATCHES):
+            report.add(play_match((index, args.seed + index, ai1, ai2, 6.0, WIN_SCORE, args.max_ticks)))
+            index += 1
+        row = next(report.rows())
+        points = next(iter(report.configs.values()))['points']
+        passed = row['draw_rate'] == 0 and row['max_ball_speed'] <= MAX_BALL_SPEED + 1e-9  # เผื่อปัดเศษทศนิยม
+        if (ai1 == 'easy' and not points[1]) or (ai2 == 'easy' and not points[0]):
+            passed = False  # easy ไม่เคยเสียคะแนนเลย
+        print(f"{ai1} vs {ai2}: draws {row['draw_rate']:.0%}, points {points[0]}-{points[1]}, "
+              f"max ball speed {row['max_ball_speed']:.1f}, {'ok' if passed else 'FAILED'}")
+        ok = ok and passed
+    return ok
+
+
+def comma_list(cast):
+    return lambda text: [cast(item) for item in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ให้คอมพิวเตอร์แข่งกันเองหลายแมตช์พร้อมกันบนทุกคอร์")
+    parser.add_argument('--matches', type=int, default=100, help="จำนวนแมตช์ต่อหนึ่งชุดการตั้งค่า")
+    parser.add_argument('--ai', type=comma_list(str), default=list(DIFFICULTIES),
+                        help="ระดับความยากที่จะจับคู่กันทุกแบบ เช่น easy,hard")
+    parser.add_argument('--serve-speed', type=comma_list(float), default=[6.0])
+    parser.add_argument('--win-score', type=comma_list(int), default=[WIN_SCORE])
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--workers', type=int, default=None, help="จำนวนโปรเซส (ค่าเริ่มต้น = จำนวนคอร์)")
+    parser.add_argument('--json', help="บันทึกผลรวมเป็นไฟล์ JSON")
+    parser.add_argument('--check', action='store_true', help="เล่นไม่กี่แมตช์แล้วตรวจว่าทุกแมตช์จบได้")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if self_test(args) else 1)
+    for name in args.ai:
+        if name not in DIFFICULTIES:
+            parser.error(f"unknown AI difficulty: {name}")
+
+    specs = list(make_specs(args))
+    report = Report()
+    start = time.perf_counter()
+    ticks = 0
+    workers = args.workers or os.cpu_count() or 1
+    with multiprocessing.Pool(workers) as pool:
+        # แมตช์สั้นยาวไม่เท่ากัน ใช้ imap_unordered ให้โปรเซสที่ว่างรับงานต่อได้ทันที
+        chunksize = max(1, len(specs) // (workers * 16))
+        for done, result in enumerate(pool.imap_unordered(play_match, specs, chunksize), 1):
+            report.add(result)
+            ticks += result[5]
+            if done % max(1, len(specs) // 10) == 0 or done == len(specs):
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(specs)} matches, {ticks / elapsed:,.0f} ticks/s")
+    report.print()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(list(report.rows()), f, indent=2)
+        print(f"Report saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()